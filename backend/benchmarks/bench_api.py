@@ -0,0 +1,414 @@
+"""
+Mixed-traffic API load test with stored baselines.
+
+Seeds a synthetic catalog shaped like seed_data.py (products by category,
+stock split over warehouses, per-warehouse reorder points) plus a ledger of
+historical transactions, then drives the app with concurrent mixed traffic:
+reads of /products/, /warehouses/inventory and /operations/recent/, and
+writes of receipts, deliveries and transfers. Reports throughput and
+p50/p99 latency per endpoint and compares them with the stored baseline.
+
+    python benchmarks/bench_api.py --scale small
+    python benchmarks/bench_api.py --scale large --mode uvicorn --workers 4
+    DATABASE_URL=postgresql://localhost/stockmaster_bench python benchmarks/bench_api.py --scale medium
+    python benchmarks/bench_api.py --scale small --save-baseline
+
+--mode inproc drives the app over the httpx ASGI transport in this process
+(one event loop, like one uvicorn worker); --mode uvicorn starts a local
+uvicorn server on the same database and goes over HTTP. Without
+DATABASE_URL a throwaway SQLite file is used. A database already seeded
+at the requested scale is reused, so large runs only pay for seeding once.
+
+Baselines live in benchmarks/baselines/<database>-<scale>-<mode>.json.
+A run regresses when an endpoint's p50 grows or its throughput drops by
+more than --tolerance against the baseline, or its p99 grows by more than
+twice that; the exit status is then 1.
+Baselines are machine specific: record them on the machine that checks them.
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+SCALES = {
+    "small": {"products": 2000, "warehouses": 20, "transactions": 100_000},
+    "medium": {"products": 20_000, "warehouses": 100, "transactions": 1_000_000},
+    "large": {"products": 100_000, "warehouses": 500, "transactions": 10_000_000},
+}
+
+# Same categories and SKU prefixes as seed_data.py
+CATEGORIES = {
+    "Processors": "CPU", "Graphics Cards": "GPU", "Motherboards": "MB", "Memory": "RAM",
+    "Storage": "SSD", "Power Supplies": "PSU", "Cases": "CASE", "Cooling": "COOL",
+    "Peripherals": "PER", "Monitors": "MON", "Complete Systems": "PC", "Accessories": "ACC",
+}
+BRANDS = ["Intel", "AMD", "NVIDIA", "ASUS", "MSI", "Gigabyte", "Corsair", "Kingston",
+          "Samsung", "WD", "Seagate", "NZXT", "Noctua", "Logitech", "Razer", "LG", "Dell"]
+
+# Share of requests per operation
+TRAFFIC = {
+    "GET /products/": 30,
+    "GET /warehouses/inventory": 15,
+    "GET /operations/recent/": 15,
+    "POST /operations/receipts/": 15,
+    "POST /operations/deliveries/": 15,
+    "POST /operations/transfers/": 10,
+}
+
+BATCH_ROWS = 10_000
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _copy_rows(db, table: str, columns, rows):
+    """Bulk insert tuples: COPY on PostgreSQL/psycopg2, driver executemany otherwise."""
+    if db.get_bind().dialect.name == "postgresql":
+        cursor = db.connection().connection.cursor()
+        try:
+            if hasattr(cursor, "copy_expert"):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(rows)
+                buffer.seek(0)
+                cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+                return
+        finally:
+            cursor.close()
+        placeholders = ", ".join(["%s"] * len(columns))
+    else:
+        placeholders = ", ".join(["?"] * len(columns))
+    db.connection().exec_driver_sql(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+
+def seed(db, scale: dict, rng: random.Random):
+    """Load the synthetic dataset into an empty database. The caller commits."""
+    import low_stock
+    import models
+    import stock
+    import versioning
+    from seed_data import DEFAULT_REORDER_POINT
+    from sqlalchemy import select
+
+    warehouse_count, product_count = scale["warehouses"], scale["products"]
+    _copy_rows(db, "warehouses", ("name", "location"), [
+        (f"Bench Warehouse {n}", f"Building {n} - Bench District") for n in range(1, warehouse_count + 1)
+    ])
+    categories = list(CATEGORIES)
+    products = []
+    for n in range(1, product_count + 1):
+        category = categories[n % len(categories)]
+        brand = rng.choice(BRANDS)
+        products.append((
+            f"{brand} {category} {n}",
+            f"{CATEGORIES[category]}-{brand[:3].upper()}-{n:07d}",
+            category,
+            "units",
+        ))
+    for start in range(0, len(products), BATCH_ROWS):
+        _copy_rows(db, "products", ("name", "sku", "category", "unit_of_measure"), products[start:start + BATCH_ROWS])
+    warehouse_ids = list(db.scalars(select(models.Warehouse.id).order_by(models.Warehouse.id)))
+    product_ids = list(db.scalars(select(models.Product.id).order_by(models.Product.id)))
+
+    # Each product stocked in a few warehouses, as seed_data splits stock over its two
+    pairs = []
+    for product_id in product_ids:
+        for warehouse_id in rng.sample(warehouse_ids, min(3, len(warehouse_ids))):
+            pairs.append((product_id, warehouse_id, rng.randint(0, 250)))
+    for start in range(0, len(pairs), BATCH_ROWS):
+        chunk = pairs[start:start + BATCH_ROWS]
+        _copy_rows(db, "inventory", ("product_id", "warehouse_id", "quantity"), chunk)
+        _copy_rows(db, "reorder_points", ("product_id", "warehouse_id", "reorder_point"),
+                   [(p, w, DEFAULT_REORDER_POINT) for p, w, _ in chunk])
+
+    # A year of settled history, oldest first
+    kinds = [("receipt", "COMPLETED", 1), ("delivery", "SHIPPED", -1), ("adjustment", "DONE", 1),
+             ("transfer_out", "DONE", -1), ("transfer_in", "DONE", 1)]
+    start_at = datetime.utcnow() - timedelta(days=365)
+    step = timedelta(days=365) / max(scale["transactions"], 1)
+    columns = ("product_id", "warehouse_id", "transaction_type", "quantity",
+               "reference", "status", "timestamp", "applied_at")
+    batch = []
+    for n in range(scale["transactions"]):
+        product_id, warehouse_id, _ = pairs[rng.randrange(len(pairs))]
+        kind, status, sign = kinds[rng.randrange(len(kinds))]
+        at = start_at + step * n
+        batch.append((product_id, warehouse_id, kind, sign * rng.randint(1, 20), f"BENCH-{n}", status, at, at))
+        if len(batch) == BATCH_ROWS:
+            _copy_rows(db, "transactions", columns, batch)
+            batch = []
+    if batch:
+        _copy_rows(db, "transactions", columns, batch)
+
+    stock.rebuild_totals(db)
+    low_stock.rebuild_alerts(db)
+    versioning.mark_changed(db, "warehouses", "products", "inventory", "transactions")
+
+
+def prepare_database(scale: dict, seed_value: int):
+    import migrations
+    import models
+    from database import SessionLocal, engine
+    from sqlalchemy import func, select
+
+    migrations.upgrade(engine)
+    with SessionLocal() as db:
+        products = db.scalar(select(func.count(models.Product.id)))
+        if products:
+            transactions = db.scalar(select(func.count(models.Transaction.id)))
+            if products < scale["products"] or transactions < scale["transactions"]:
+                print(f"❌ Database holds {products} products / {transactions} transactions, "
+                      f"fewer than the requested scale; use an empty database")
+                sys.exit(1)
+            print(f"Reusing seeded database ({products} products, {transactions} transactions)")
+        else:
+            started = time.perf_counter()
+            seed(db, scale, random.Random(seed_value))
+            db.commit()
+            print(f"Seeded {scale['products']} products, {scale['warehouses']} warehouses and "
+                  f"{scale['transactions']} transactions in {time.perf_counter() - started:.1f}s")
+
+        pairs = [tuple(row) for row in db.execute(
+            select(models.Inventory.product_id, models.Inventory.warehouse_id).limit(20_000)
+        )]
+        warehouse_ids = list(db.scalars(select(models.Warehouse.id)))
+    return engine.url.get_backend_name(), pairs, warehouse_ids
+
+
+def _request(operation: str, rng: random.Random, pairs, warehouse_ids):
+    """(method, path, params, json) for one operation on a random stocked pair."""
+    method, path = operation.split(" ", 1)
+    if method == "GET":
+        params = {"limit": 50} if path != "/warehouses/inventory" else None
+        return method, path, params, None
+    product_id, warehouse_id = pairs[rng.randrange(len(pairs))]
+    quantity = rng.randint(1, 5)
+    if path == "/operations/receipts/":
+        body = {"product_id": product_id, "warehouse_id": warehouse_id, "quantity": quantity,
+                "supplier_name": "bench", "status": "COMPLETED"}
+    elif path == "/operations/deliveries/":
+        body = {"product_id": product_id, "warehouse_id": warehouse_id, "quantity": quantity,
+                "customer_name": "bench", "status": "SHIPPED"}
+    else:
+        to_warehouse = rng.choice([w for w in warehouse_ids[:50] if w != warehouse_id] or warehouse_ids)
+        body = {"product_id": product_id, "from_warehouse_id": warehouse_id,
+                "to_warehouse_id": to_warehouse, "quantity": quantity}
+    return method, path, None, body
+
+
+async def drive(client, args, pairs, warehouse_ids):
+    operations = list(TRAFFIC)
+    weights = [TRAFFIC[operation] for operation in operations]
+    samples = {operation: [] for operation in operations}
+    outcomes = {operation: {"errors": 0, "rejected": 0} for operation in operations}
+    started = time.perf_counter()
+    measure_from = started + args.warmup
+    stop_at = measure_from + args.duration
+
+    async def worker(index: int):
+        rng = random.Random(args.seed * 1000 + index)
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                return
+            operation = rng.choices(operations, weights)[0]
+            method, path, params, body = _request(operation, rng, pairs, warehouse_ids)
+            sent = time.perf_counter()
+            response = await client.request(method, path, params=params, json=body)
+            elapsed = time.perf_counter() - sent
+            if sent < measure_from:
+                continue
+            samples[operation].append(elapsed)
+            if response.status_code >= 500:
+                outcomes[operation]["errors"] += 1
+            elif response.status_code >= 400:
+                # Insufficient stock and the like: a valid answer, counted apart
+                outcomes[operation]["rejected"] += 1
+
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+
+    endpoints = {}
+    for operation in operations:
+        times = samples[operation]
+        endpoints[operation] = {
+            "requests": len(times),
+            "throughput": round(len(times) / args.duration, 1),
+            "p50_ms": round(percentile(times, 50) * 1000, 2),
+            "p99_ms": round(percentile(times, 99) * 1000, 2),
+            **outcomes[operation],
+        }
+    every = [value for times in samples.values() for value in times]
+    endpoints["ALL"] = {
+        "requests": len(every),
+        "throughput": round(len(every) / args.duration, 1),
+        "p50_ms": round(percentile(every, 50) * 1000, 2),
+        "p99_ms": round(percentile(every, 99) * 1000, 2),
+        "errors": sum(outcome["errors"] for outcome in outcomes.values()),
+        "rejected": sum(outcome["rejected"] for outcome in outcomes.values()),
+    }
+    return endpoints
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_uvicorn(args, pairs, warehouse_ids):
+    import httpx
+
+    port = args.port or _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "AUTO_MIGRATE": "false", "SEED_DATABASE": "false"},
+    )
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            for _ in range(100):
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn exited during startup")
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.2)
+            else:
+                raise RuntimeError("uvicorn did not become healthy")
+            return await drive(client, args, pairs, warehouse_ids)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+async def run_inproc(args, pairs, warehouse_ids):
+    import httpx
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        return await drive(client, args, pairs, warehouse_ids)
+
+
+def report(endpoints: dict, baseline: dict, tolerance: float) -> list:
+    """Print the results table; returns the regressions against the baseline."""
+    regressions = []
+    print(f"{'endpoint':<30}{'req':>7}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'err':>6}{'rej':>6}  vs baseline")
+    for name, result in endpoints.items():
+        line = (f"{name:<30}{result['requests']:>7}{result['throughput']:>9.1f}{result['p50_ms']:>9.2f}"
+                f"{result['p99_ms']:>9.2f}{result['errors']:>6}{result['rejected']:>6}")
+        base = (baseline or {}).get("endpoints", {}).get(name)
+        if base:
+            change = {
+                key: result[key] / base[key] - 1 if base[key] else 0.0
+                for key in ("p50_ms", "p99_ms", "throughput")
+            }
+            line += f"  p50 {change['p50_ms']:+.0%}  p99 {change['p99_ms']:+.0%}  req/s {change['throughput']:+.0%}"
+            # The tail is noisier than the median, so p99 gets twice the slack
+            if change["p50_ms"] > tolerance or change["p99_ms"] > 2 * tolerance or change["throughput"] < -tolerance:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--products", type=int, help="override the scale's product count")
+    parser.add_argument("--warehouses", type=int, help="override the scale's warehouse count")
+    parser.add_argument("--transactions", type=int, help="override the scale's transaction count")
+    parser.add_argument("--mode", choices=("inproc", "uvicorn"), default="inproc")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=0, help="uvicorn port (default: any free port)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before that")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 / throughput change (p99: twice this)")
+    parser.add_argument("--output", help="also write the results as JSON here")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    args = parser.parse_args()
+
+    scale = dict(SCALES[args.scale])
+    for key in scale:
+        if getattr(args, key) is not None:
+            scale[key] = getattr(args, key)
+    scale_name = args.scale if scale == SCALES[args.scale] else "custom"
+
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    sys.path.insert(0, BACKEND_DIR)
+
+    database, pairs, warehouse_ids = prepare_database(scale, args.seed)
+    print(f"database={database} scale={scale_name} mode={args.mode} concurrency={args.concurrency} "
+          f"duration={args.duration:g}s")
+    runner = run_uvicorn if args.mode == "uvicorn" else run_inproc
+    endpoints = asyncio.run(runner(args, pairs, warehouse_ids))
+
+    results = {
+        "database": database,
+        "scale": scale,
+        "mode": args.mode,
+        "workers": args.workers if args.mode == "uvicorn" else 1,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "recorded_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "endpoints": endpoints,
+    }
+    baseline_path = os.path.join(BASELINE_DIR, f"{database}-{scale_name}-{args.mode}.json")
+    baseline = None
+    if not args.save_baseline and os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if baseline.get("machine", {}).get("cpus") != os.cpu_count():
+            print(f"Note: baseline was recorded with {baseline['machine'].get('cpus')} CPUs, this machine has {os.cpu_count()}")
+
+    regressions = report(endpoints, baseline, args.tolerance)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"✅ Baseline saved to {os.path.relpath(baseline_path, BACKEND_DIR)}")
+    elif baseline is None:
+        print(f"No baseline at {os.path.relpath(baseline_path, BACKEND_DIR)}; record one with --save-baseline")
+    elif regressions:
+        print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    else:
+        print(f"✅ Within {args.tolerance:.0%} of the baseline")
+    if any(result["errors"] for result in endpoints.values()):
+        print("❌ Server errors during the run")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Receipt ingest benchmark: synchronous commits vs the write-behind queue.
+
+Sends the same burst of dock receipts (one operation per request, from
+--concurrency clients) first to POST /operations/receipts/, which commits
+each one, then to POST /operations/queue/, which appends it to the ingest
+queue for the background worker to group-commit. Reports request latency,
+accepted requests per second and, for the queue, how long until every
+entry was applied to inventory.
+
+    python benchmarks/bench_ingest.py --receipts 5000 --concurrency 32
+    python benchmarks/bench_ingest.py --batch-size 1000 --products 100
+
+Runs in-process over the httpx ASGI transport. Without DATABASE_URL a
+throwaway SQLite file is used; the queue file always goes to a temporary
+directory.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed(db, products: int, warehouses: int):
+    """Catalog for the run; returns (product ids, warehouse ids)."""
+    from sqlalchemy import insert, select
+    import models
+
+    run = int(time.time())
+    db.execute(insert(models.Warehouse), [
+        {"name": f"Dock {run}-{n}", "location": "Bench"} for n in range(warehouses)
+    ])
+    db.execute(insert(models.Product), [
+        {"sku": f"ING-{run}-{n:05d}", "name": f"Pallet item {n}", "category": "Bench", "unit_of_measure": "Units"}
+        for n in range(products)
+    ])
+    db.commit()
+    product_ids = db.scalars(select(models.Product.id).where(models.Product.sku.like(f"ING-{run}-%"))).all()
+    warehouse_ids = db.scalars(select(models.Warehouse.id).where(models.Warehouse.name.like(f"Dock {run}-%"))).all()
+    return product_ids, warehouse_ids
+
+
+def receipts(count: int, product_ids, warehouse_ids, rng: random.Random):
+    return [
+        {
+            "product_id": rng.choice(product_ids),
+            "warehouse_id": rng.choice(warehouse_ids),
+            "quantity": rng.randint(1, 20),
+            "supplier_name": "Bench Supplier",
+            "status": "COMPLETED",
+        }
+        for _ in range(count)
+    ]
+
+
+async def burst(client, concurrency: int, requests):
+    """Send (path, body) pairs from `concurrency` clients; returns (latencies, errors, seconds, responses)."""
+    latencies, responses = [], []
+    errors = 0
+    cursor = iter(requests)
+
+    async def sender():
+        nonlocal errors
+        for path, body in cursor:
+            sent = time.perf_counter()
+            response = await client.post(path, json=body)
+            latencies.append(time.perf_counter() - sent)
+            if response.status_code >= 400:
+                errors += 1
+            else:
+                responses.append(response.json())
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started, responses
+
+
+def summary(name: str, latencies, errors: int, seconds: float):
+    print(
+        f"{name:<10} n={len(latencies):<6} {len(latencies) / seconds:8.1f} req/s  "
+        f"p50={percentile(latencies, 50) * 1000:7.2f} ms  p99={percentile(latencies, 99) * 1000:7.2f} ms  "
+        f"errors={errors}"
+    )
+
+
+async def run(args):
+    import httpx
+    import ingest
+    import migrations
+    from database import SessionLocal, engine
+    from main import app
+    from routers import operations
+
+    # The ASGI transport does not run the lifespan hook
+    migrations.upgrade(engine)
+    with SessionLocal() as db:
+        product_ids, warehouse_ids = seed(db, args.products, args.warehouses)
+
+    rng = random.Random(args.seed)
+    sync_bodies = receipts(args.receipts, product_ids, warehouse_ids, rng)
+    queued_bodies = receipts(args.receipts, product_ids, warehouse_ids, rng)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        latencies, errors, seconds, _ = await burst(
+            client, args.concurrency, (("/operations/receipts/", body) for body in sync_bodies)
+        )
+        summary("sync", latencies, errors, seconds)
+
+        ingest.start(operations.apply_queued)
+        try:
+            started = time.perf_counter()
+            latencies, errors, seconds, _ = await burst(
+                client, args.concurrency,
+                (("/operations/queue/", {"operations": [{"type": "receipt", **body}]}) for body in queued_bodies),
+            )
+            summary("queued", latencies, errors, seconds)
+            while True:
+                status = (await client.get("/operations/queue/")).json()
+                if not status["queued"] and not status["applying"]:
+                    break
+                await asyncio.sleep(0.01)
+            drained = time.perf_counter() - started
+        finally:
+            ingest.stop()
+
+    applied = status["applied"] + status["failed"]
+    print(f"queue drained: {applied} entries applied in {drained:.2f}s ({applied / drained:.1f} ops/s end to end), "
+          f"batch size {ingest.INGEST_BATCH_SIZE}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--receipts", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--warehouses", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, help="INGEST_BATCH_SIZE for the run")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    if not os.getenv("DATABASE_URL"):
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["INGEST_QUEUE_ENABLED"] = "true"
+    os.environ["INGEST_QUEUE_PATH"] = os.path.join(workdir, "ingest_queue.db")
+    if args.batch_size:
+        os.environ["INGEST_BATCH_SIZE"] = str(args.batch_size)
+    sys.path.insert(0, BACKEND_DIR)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Login throughput / latency benchmark.
+
+Fires concurrent POST /auth/login requests at the app in-process (httpx
+ASGI transport, single event loop, like one uvicorn worker) while a probe
+keeps hitting GET /health. Login p99 shows the bcrypt cost; probe p99
+shows whether hashing blocks other requests on the worker.
+
+    python benchmarks/bench_login.py --logins 200 --concurrency 20
+    BCRYPT_ROUNDS=10 PASSWORD_HASH_WORKERS=8 python benchmarks/bench_login.py
+
+Without DATABASE_URL a throwaway SQLite file is used.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summary(name, samples, elapsed=None):
+    line = (
+        f"{name:<8} n={len(samples):<5} p50={percentile(samples, 50) * 1000:8.1f} ms  "
+        f"p99={percentile(samples, 99) * 1000:8.1f} ms"
+    )
+    if elapsed:
+        line += f"  {len(samples) / elapsed:8.1f} req/s"
+    print(line)
+
+
+async def run(args):
+    import httpx
+    import migrations
+    from database import engine
+    from main import app
+
+    # The ASGI transport does not run the lifespan hook
+    migrations.upgrade(engine)
+
+    email, password = "bench@stockmaster.com", "bench-password"
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/auth/signup", json={"email": email, "password": password, "full_name": "Bench"})
+
+        login_times, probe_times, statuses = [], [], {}
+        queue = asyncio.Queue()
+        for _ in range(args.logins):
+            queue.put_nowait(None)
+
+        async def login_worker():
+            while not queue.empty():
+                queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.post("/auth/login", data={"username": email, "password": password})
+                login_times.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        async def probe(done):
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/health")
+                probe_times.append(time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+
+        done = asyncio.Event()
+        probe_task = asyncio.create_task(probe(done))
+        started = time.perf_counter()
+        await asyncio.gather(*(login_worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    print(f"bcrypt rounds={os.getenv('BCRYPT_ROUNDS', '12')} "
+          f"hash workers={os.getenv('PASSWORD_HASH_WORKERS', 'default')} "
+          f"concurrency={args.concurrency} statuses={statuses}")
+    summary("login", login_times, elapsed)
+    summary("/health", probe_times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    sys.path.insert(0, BACKEND_DIR)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
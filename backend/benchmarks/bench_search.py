@@ -0,0 +1,155 @@
+"""
+Product search / SKU autocomplete latency benchmark.
+
+Seeds a synthetic catalog, then times GET /products/search (exact terms,
+partial words and typos) and GET /products/autocomplete in-process over the
+httpx ASGI transport, one request at a time, and checks p99 against the
+targets in search.py.
+
+    python benchmarks/bench_search.py --products 100000 --requests 500
+
+Without DATABASE_URL a throwaway SQLite file is used; an existing catalog
+in DATABASE_URL is reused when it already has --products rows.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS_MS = {"search": 75, "autocomplete": 5}
+
+ADJECTIVES = ["steel", "copper", "plastic", "heavy", "compact", "industrial", "wireless", "premium",
+              "thermal", "portable", "hydraulic", "modular", "digital", "rugged", "precision"]
+NOUNS = ["bolt", "washer", "bracket", "sensor", "valve", "cable", "pump", "filter", "gasket",
+         "bearing", "switch", "hinge", "adapter", "clamp", "relay", "motor", "spring", "fitting"]
+CATEGORIES = ["Hardware", "Electrical", "Plumbing", "Tools", "Safety", "Packaging", "Fasteners"]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def typo(word: str, rng: random.Random) -> str:
+    """Drop, swap or replace one inner character."""
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.choice(("drop", "swap", "replace"))
+    if kind == "drop":
+        return word[:i] + word[i + 1:]
+    if kind == "swap":
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + rng.choice("aeiou") + word[i + 1:]
+
+
+def sku(n: int) -> str:
+    return f"{NOUNS[n % len(NOUNS)][:3].upper()}-{n:07d}"
+
+
+def seed(db, count: int, rng: random.Random):
+    from sqlalchemy import func, insert, select
+    import models
+
+    existing = db.scalar(select(func.count(models.Product.id)))
+    if existing >= count:
+        return existing
+    batch = []
+    for n in range(existing, count):
+        batch.append({
+            "sku": sku(n),
+            "name": f"{rng.choice(ADJECTIVES).title()} {rng.choice(NOUNS)} {rng.randint(1, 999)}mm",
+            "category": rng.choice(CATEGORIES),
+            "unit_of_measure": "Units",
+        })
+        if len(batch) == 5000:
+            db.execute(insert(models.Product), batch)
+            batch = []
+    if batch:
+        db.execute(insert(models.Product), batch)
+    db.commit()
+    return count
+
+
+def summary(name, samples):
+    p99 = percentile(samples, 99) * 1000
+    verdict = "ok" if p99 <= TARGETS_MS[name] else f"over {TARGETS_MS[name]} ms target"
+    print(
+        f"{name:<13} n={len(samples):<5} p50={percentile(samples, 50) * 1000:7.2f} ms  "
+        f"p99={p99:7.2f} ms  max={max(samples) * 1000:7.2f} ms  {verdict}"
+    )
+
+
+async def run(args):
+    import httpx
+    import migrations
+    import search
+    from database import SessionLocal, engine
+    from main import app
+
+    # The ASGI transport does not run the lifespan hook
+    migrations.upgrade(engine)
+    rng = random.Random(args.seed)
+    with SessionLocal() as db:
+        started = time.perf_counter()
+        products = seed(db, args.products, rng)
+        print(f"catalog: {products} products (seeded in {time.perf_counter() - started:.1f}s), "
+              f"search backend={search._backend(db)}")
+
+    queries = []
+    for _ in range(args.requests):
+        noun, adjective = rng.choice(NOUNS), rng.choice(ADJECTIVES)
+        queries.append(rng.choice([
+            noun,
+            f"{adjective} {noun}",
+            noun[:4],
+            typo(adjective, rng),
+            sku(rng.randrange(products)),
+        ]))
+    prefixes = [sku(rng.randrange(products))[:rng.randint(2, 9)].lower() for _ in range(args.requests)]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm caches and the SKU index before timing
+        await client.get("/products/search", params={"q": "bolt"})
+        await client.get("/products/autocomplete", params={"prefix": "bol"})
+
+        timings = {"search": [], "autocomplete": []}
+        empty = 0
+        for query in queries:
+            started = time.perf_counter()
+            response = await client.get("/products/search", params={"q": query, "limit": 20})
+            timings["search"].append(time.perf_counter() - started)
+            empty += not response.json()
+        for prefix in prefixes:
+            started = time.perf_counter()
+            await client.get("/products/autocomplete", params={"prefix": prefix})
+            timings["autocomplete"].append(time.perf_counter() - started)
+
+    print(f"search queries with no results: {empty}/{len(queries)}")
+    for name, samples in timings.items():
+        summary(name, samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    sys.path.insert(0, BACKEND_DIR)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Bulk operation consistency checks.
+
+Runs bulk batches through the API against a fresh catalog and fails if any
+of them leaves stray inventory rows behind:
+
+  delivery-only    a batch with no stock increases keeps the inventory
+                   row count unchanged
+  queued-race      an ingest-queue batch whose decrement loses a race
+                   with another writer is planned again without leaving
+                   NULL-keyed inventory rows, and reports the item failed
+
+    python benchmarks/check_bulk.py
+
+Without DATABASE_URL a throwaway SQLite file is used; the queue file
+always goes to a temporary directory.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    if not os.getenv("DATABASE_URL"):
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bulk.db')}"
+    os.environ["INGEST_QUEUE_PATH"] = os.path.join(workdir, "ingest_queue.db")
+    sys.path.insert(0, BACKEND_DIR)
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func, or_, select
+    import ingest, migrations, models, stock
+    from database import SessionLocal, engine
+    from main import app
+    from routers import operations
+
+    migrations.upgrade(engine)
+    with SessionLocal() as db:
+        suffix = str(int(time.time() * 1000))
+        product = models.Product(name="Bulk SKU", sku=f"BULK-{suffix}", category="Bulk", unit_of_measure="units")
+        warehouse = models.Warehouse(name=f"Bulk Warehouse {suffix}", location="-")
+        db.add_all([product, warehouse])
+        db.flush()
+        stock.add_stock(db, product.id, warehouse.id, 100)
+        db.commit()
+        product_id, warehouse_id = product.id, warehouse.id
+
+    def inventory_rows() -> tuple:
+        """(row count, rows with a NULL product or warehouse)"""
+        with SessionLocal() as db:
+            return (
+                db.scalar(select(func.count()).select_from(models.Inventory)),
+                db.scalar(
+                    select(func.count()).select_from(models.Inventory).where(or_(
+                        models.Inventory.product_id.is_(None), models.Inventory.warehouse_id.is_(None),
+                    ))
+                ),
+            )
+
+    def delivery(quantity: int) -> dict:
+        return {
+            "type": "delivery", "product_id": product_id, "warehouse_id": warehouse_id,
+            "quantity": quantity, "customer_name": "bulk", "status": "SHIPPED",
+        }
+
+    client = TestClient(app)
+    failures = []
+
+    # delivery-only
+    before = inventory_rows()
+    response = client.post("/operations/bulk/", json={"atomic": True, "operations": [delivery(1), delivery(2)]})
+    after = inventory_rows()
+    if response.status_code != 200 or not response.json()["success"]:
+        failures.append(f"delivery-only: request failed with {response.status_code} {response.text}")
+    elif after != before:
+        failures.append(f"delivery-only: inventory rows (count, NULL-keyed) went from {before} to {after}")
+
+    # queued-race: another writer takes stock between the batch's read and
+    # its conditional decrement
+    load_stock = operations._load_stock
+    raced = []
+
+    def racing_load_stock(db, *args, **kwargs):
+        ledger = load_stock(db, *args, **kwargs)
+        if not raced:
+            raced.append(True)
+            with SessionLocal() as other:
+                stock.remove_stock(other, product_id, warehouse_id, ledger[(product_id, warehouse_id)] - 10)
+                other.commit()
+        return ledger
+
+    before = inventory_rows()
+    [entry] = ingest.enqueue([delivery(50)])
+    operations._load_stock = racing_load_stock
+    try:
+        ingest.Worker(operations.apply_queued).drain_once()
+    finally:
+        operations._load_stock = load_stock
+    after, outcome = inventory_rows(), ingest.get(entry["id"])
+    if not raced:
+        failures.append("queued-race: the batch never read stock")
+    elif after != before:
+        failures.append(f"queued-race: inventory rows (count, NULL-keyed) went from {before} to {after}")
+    elif outcome is None or outcome["status"] != "failed":
+        failures.append(f"queued-race: entry should fail once stock is gone, got {outcome and dict(outcome)}")
+
+    print(f"database:   {engine.url.get_backend_name()}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK: bulk batches left no stray inventory rows")
+
+
+if __name__ == "__main__":
+    main()
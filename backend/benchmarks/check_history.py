@@ -0,0 +1,178 @@
+"""
+Stock history consistency check.
+
+Posts receipts and deliveries through the API, flips their statuses back
+and forth (COMPLETED <-> IN_TRANSIT, SHIPPED <-> SHIPPING) and
+takes snapshots in between. The run fails if stock rebuilt with
+GET /history/stock at the current time differs from live inventory for any
+(product, warehouse), or if stock as of a snapshot differs from that
+snapshot. It then reverts a shipped delivery of a fresh product and fails
+unless the movement and turnover reports leave it out of outbound and
+inbound alike.
+
+    python benchmarks/check_history.py --operations 300 --snapshots 5
+
+Without DATABASE_URL a throwaway SQLite file is used.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# status to flip to, by (type, current status)
+FLIPS = {
+    ("receipt", "COMPLETED"): "IN_TRANSIT",
+    ("receipt", "IN_TRANSIT"): "COMPLETED",
+    ("delivery", "SHIPPED"): "SHIPPING",
+    ("delivery", "SHIPPING"): "SHIPPED",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--operations", type=int, default=300)
+    parser.add_argument("--snapshots", type=int, default=5)
+    parser.add_argument("--products", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(), "history.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    sys.path.insert(0, BACKEND_DIR)
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import select
+    import migrations, models
+    from database import SessionLocal, engine
+    from main import app
+
+    migrations.upgrade(engine)
+    with SessionLocal() as db:
+        suffix = str(int(time.time() * 1000))
+        products = [
+            models.Product(name=f"History SKU {n}", sku=f"HIST-{suffix}-{n}", category="History", unit_of_measure="units")
+            for n in range(args.products)
+        ]
+        warehouse = models.Warehouse(name=f"History Warehouse {suffix}", location="-")
+        db.add_all([*products, warehouse])
+        db.commit()
+        product_ids, warehouse_id = [product.id for product in products], warehouse.id
+
+    def stock_as_of(at: datetime) -> dict:
+        response = client.get("/history/stock", params={"at": at.isoformat(), "warehouse_id": warehouse_id})
+        response.raise_for_status()
+        return {item["product_id"]: item["quantity"] for item in response.json()["items"] if item["quantity"]}
+
+    def live_stock() -> dict:
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(models.Inventory.product_id, models.Inventory.quantity)
+                .where(models.Inventory.warehouse_id == warehouse_id)
+            ).all()
+        return {row.product_id: row.quantity for row in rows if row.quantity}
+
+    rng = random.Random(args.seed)
+    client = TestClient(app)
+    flippable = []  # [transaction id, type, status]
+    snapshots = []  # (taken_at, stock at that time)
+    snapshot_every = max(1, args.operations // (args.snapshots + 1))
+    errors = 0
+
+    for n in range(args.operations):
+        roll = rng.random()
+        if flippable and roll < 0.3:
+            entry = rng.choice(flippable)
+            status = FLIPS.get((entry[1], entry[2]))
+            if status is not None:
+                response = client.patch(f"/operations/{entry[0]}/status", json={"status": status})
+                if response.status_code == 200:
+                    entry[2] = status
+                elif response.status_code != 400:
+                    errors += 1
+        else:
+            kind = "receipt" if roll < 0.7 else "delivery"
+            body = {"product_id": rng.choice(product_ids), "warehouse_id": warehouse_id, "quantity": rng.randint(1, 20)}
+            if kind == "receipt":
+                body.update(supplier_name="history", status="COMPLETED")
+                response = client.post("/operations/receipts/", json=body)
+            else:
+                body.update(customer_name="history", status="SHIPPED")
+                response = client.post("/operations/deliveries/", json=body)
+            if response.status_code == 200:
+                flippable.append([response.json()["transaction_id"], kind, body["status"]])
+            elif response.status_code != 400:
+                errors += 1
+
+        if (n + 1) % snapshot_every == 0 and len(snapshots) < args.snapshots:
+            response = client.post("/history/snapshots")
+            response.raise_for_status()
+            snapshots.append((datetime.fromisoformat(response.json()["taken_at"]), live_stock()))
+
+    mismatches = 0
+    live, rebuilt = live_stock(), stock_as_of(datetime.utcnow())
+    if rebuilt != live:
+        mismatches += 1
+        print(f"as of now: {rebuilt}\nlive:      {live}")
+    for taken_at, expected in snapshots:
+        found = stock_as_of(taken_at)
+        if found != expected:
+            mismatches += 1
+            print(f"as of snapshot {taken_at}: {found}\nsnapshot:  {expected}")
+
+    # A reverted delivery must not count as shipped, nor its undo as inbound
+    with SessionLocal() as db:
+        product = models.Product(name="History reverted", sku=f"HIST-{suffix}-R", category="History", unit_of_measure="units")
+        db.add(product)
+        db.commit()
+        reverted_id = product.id
+    client.post("/operations/receipts/", json={
+        "product_id": reverted_id, "warehouse_id": warehouse_id, "quantity": 10,
+        "supplier_name": "history", "status": "COMPLETED",
+    }).raise_for_status()
+    response = client.post("/operations/deliveries/", json={
+        "product_id": reverted_id, "warehouse_id": warehouse_id, "quantity": 3,
+        "customer_name": "history", "status": "SHIPPED",
+    })
+    response.raise_for_status()
+    client.patch(f"/operations/{response.json()['transaction_id']}/status", json={"status": "SHIPPING"}).raise_for_status()
+
+    today = datetime.utcnow().date().isoformat()
+    for engine_name in ("sql", "pandas"):
+        response = client.get("/reports/movements", params={
+            "start": today, "end": today, "product_id": reverted_id, "engine": engine_name,
+        })
+        if engine_name == "pandas" and response.status_code == 400:
+            continue  # pandas not installed
+        response.raise_for_status()
+        rows = [(row["inbound"], row["outbound"], row["net"]) for row in response.json()]
+        if rows != [(10, 0, 10)]:
+            mismatches += 1
+            print(f"movements ({engine_name}) after a reverted delivery: {rows}, expected [(10, 0, 10)]")
+    response = client.get("/reports/turnover", params={"start": today, "end": today, "warehouse_id": warehouse_id})
+    response.raise_for_status()
+    [row] = [row for row in response.json() if row["product_id"] == reverted_id]
+    if row["outbound"] != 0 or row["closing_stock"] != 10:
+        mismatches += 1
+        print(f"turnover after a reverted delivery: outbound {row['outbound']}, closing {row['closing_stock']}")
+
+    flips = sum(1 for entry in flippable if entry[2] in ("IN_TRANSIT", "SHIPPING"))
+    print(f"database:   {engine.url.get_backend_name()}")
+    print(f"operations: {args.operations}, {len(flippable)} applied, {flips} currently reverted, "
+          f"{len(snapshots)} snapshots")
+    if errors:
+        print(f"FAIL: {errors} requests failed with errors")
+        sys.exit(1)
+    if mismatches:
+        print(f"FAIL: {mismatches} as-of or report results differ from inventory")
+        sys.exit(1)
+    print("OK: history matches inventory")
+
+
+if __name__ == "__main__":
+    main()
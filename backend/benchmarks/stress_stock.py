@@ -0,0 +1,114 @@
+"""
+Multi-threaded overselling stress test for the stock mutation layer.
+
+Many threads post SHIPPED deliveries against one product/warehouse row
+through the real create_delivery handler, each with its own session.
+The run fails if any request errors, if the final stock is negative or
+if it does not match the deliveries that succeeded.
+
+    python benchmarks/stress_stock.py --threads 32 --requests 2000 --stock 500
+    DATABASE_URL=postgresql://... python benchmarks/stress_stock.py
+
+Without DATABASE_URL a throwaway SQLite file is used.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--stock", type=int, default=500)
+    parser.add_argument("--quantity", type=int, default=1, help="units per delivery")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(), "stress.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    sys.path.insert(0, BACKEND_DIR)
+
+    from fastapi import HTTPException
+    import models, schemas, stock
+    from database import SessionLocal, engine
+    from routers.operations import create_delivery
+
+    models.Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        suffix = str(int(time.time() * 1000))
+        product = models.Product(name="Stress SKU", sku=f"STRESS-{suffix}", category="Stress", unit_of_measure="units")
+        warehouse = models.Warehouse(name=f"Stress Warehouse {suffix}", location="-")
+        db.add_all([product, warehouse])
+        db.flush()
+        stock.add_stock(db, product.id, warehouse.id, args.stock)
+        db.commit()
+        product_id, warehouse_id = product.id, warehouse.id
+
+    outcomes = Counter()
+    lock = threading.Lock()
+    remaining = iter(range(args.requests))
+
+    def worker():
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            delivery = schemas.DeliveryCreate(
+                product_id=product_id,
+                warehouse_id=warehouse_id,
+                quantity=args.quantity,
+                customer_name="stress",
+                status="SHIPPED",
+            )
+            db = SessionLocal()
+            try:
+                create_delivery(delivery, db=db, idempotency_key=None)
+                outcome = "shipped"
+            except HTTPException as e:
+                outcome = "insufficient" if e.status_code == 400 else f"error {e.status_code}"
+            finally:
+                db.close()
+            with lock:
+                outcomes[outcome] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with SessionLocal() as db:
+        final = stock.get_quantity(db, product_id, warehouse_id)
+    expected = args.stock - outcomes["shipped"] * args.quantity
+
+    print(f"database:   {engine.url.get_backend_name()}")
+    print(f"requests:   {args.requests} on {args.threads} threads in {elapsed:.2f}s "
+          f"({args.requests / elapsed:.0f} req/s)")
+    for outcome, count in sorted(outcomes.items()):
+        print(f"  {outcome:<13}{count}")
+    print(f"stock:      start {args.stock}, final {final}, expected {expected}")
+
+    errors = sum(count for outcome, count in outcomes.items() if outcome.startswith("error"))
+    if errors:
+        print(f"FAIL: {errors} requests failed with errors")
+        sys.exit(1)
+    if outcomes["shipped"] + outcomes["insufficient"] != args.requests:
+        print(f"FAIL: {outcomes['shipped'] + outcomes['insufficient']} outcomes for {args.requests} requests")
+        sys.exit(1)
+    if final < 0 or final != expected:
+        print("FAIL: stock was oversold or lost updates")
+        sys.exit(1)
+    print("OK: no overselling")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Create or upgrade the database schema, optionally loading the sample data.
+Run once per deploy, before starting the web workers.
+
+    python bootstrap.py            # create/upgrade the schema
+    python bootstrap.py --seed     # ... and load the sample electronics catalog
+    python bootstrap.py --check    # exit code 1 if the schema is not current
+"""
+import argparse
+import sys
+import time
+
+from database import engine
+import migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or upgrade the StockMaster database")
+    parser.add_argument("--seed", action="store_true", help="load sample data into an empty database")
+    parser.add_argument("--check", action="store_true", help="only report whether the schema is current")
+    args = parser.parse_args()
+
+    version = migrations.current_version(engine)
+    if args.check:
+        if version < migrations.SCHEMA_VERSION:
+            print(f"❌ Schema at revision {version}, expected {migrations.SCHEMA_VERSION}")
+            sys.exit(1)
+        print(f"✅ Schema at revision {version}")
+        return
+
+    started = time.perf_counter()
+    if migrations.upgrade(engine):
+        print(f"✅ Schema upgraded from revision {version} to {migrations.SCHEMA_VERSION} "
+              f"in {time.perf_counter() - started:.2f}s")
+    else:
+        print(f"✅ Schema already at revision {version}")
+
+    if args.seed:
+        from seed_data import seed_database
+        seed_database()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Import a product catalog (products, stock, reorder points) from CSV or NDJSON.
+
+    python bulk_import.py catalog.csv
+    python bulk_import.py catalog.ndjson --update-existing
+    python bulk_import.py catalog.csv --resume 12    # continue failed job 12
+
+See importer.py for the columns.
+"""
+import argparse
+import sys
+import time
+
+from database import SessionLocal
+import importer
+import models
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import products and stock")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=importer.FORMATS, help="default: from the file extension")
+    parser.add_argument("--update-existing", action="store_true", help="overwrite fields of known SKUs")
+    parser.add_argument("--resume", type=int, metavar="JOB_ID", help="continue a failed or interrupted job")
+    parser.add_argument("--chunk-rows", type=int, default=importer.IMPORT_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.resume:
+            job = db.get(models.ImportJob, args.resume)
+            if not job:
+                print(f"❌ Import job {args.resume} not found")
+                sys.exit(1)
+        else:
+            job = importer.create_job(
+                db, args.format or importer.detect_format(args.path), source=args.path,
+                update_existing=args.update_existing,
+            )
+        print(f"Import job {job.id}")
+
+        started = time.perf_counter()
+        first_row = job.rows_processed
+
+        def progress(job):
+            rate = (job.rows_processed - first_row) / max(time.perf_counter() - started, 1e-9)
+            print(f"  {job.rows_processed} rows, {job.error_count} rejected, {rate:,.0f} rows/s")
+
+        with open(args.path, encoding="utf-8-sig", newline="") as stream:
+            try:
+                importer.run_import(db, stream, job, chunk_rows=args.chunk_rows, on_chunk=progress)
+            except Exception as e:
+                print(f"❌ Import failed after {job.rows_processed} rows: {e}")
+                print(f"   Resume with: python bulk_import.py {args.path} --resume {job.id}")
+                sys.exit(1)
+
+        elapsed = time.perf_counter() - started
+        print(
+            f"✅ {job.rows_processed - first_row} rows in {elapsed:.1f}s "
+            f"({(job.rows_processed - first_row) / max(elapsed, 1e-9):,.0f} rows/s): "
+            f"{job.products_created} products created, {job.products_updated} updated, "
+            f"{job.stock_rows} stock rows, {job.error_count} rejected"
+        )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
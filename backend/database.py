@@ -1,9 +1,15 @@
-from sqlalchemy import create_engine
+from fastapi import Request, Response
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 import os
+import time
 from dotenv import load_dotenv
 from pathlib import Path
+import metrics
 
 env_path = Path(__file__).parent / '.env'
 load_dotenv(dotenv_path=env_path)
@@ -14,18 +20,237 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./stockmaster.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-connect_args = {"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+# Optional read replica for read-only GET handlers (see get_read_db)
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL", "")
+if DATABASE_REPLICA_URL.startswith("postgres://"):
+    DATABASE_REPLICA_URL = DATABASE_REPLICA_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(
-    DATABASE_URL, connect_args=connect_args
-)
+# Read-your-writes: writes return this header, reads that send it back are
+# served by the primary until the replica has caught up with it
+CONSISTENCY_HEADER = "X-Consistency-Token"
+
+# Connection pool settings (server databases such as PostgreSQL)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds before a connection is replaced
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 = no limit
+
+# Optional async engine (needs asyncpg or aiosqlite installed)
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() == "true"
+
+# SQLite settings
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited (see metrics.py)."""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            metrics.observe_pool_wait(time.perf_counter() - started)
+
+
+def create_db_engine(url: str):
+    """Create an engine tuned from the environment settings above."""
+    if url.startswith("sqlite"):
+        # In-memory databases keep SQLAlchemy's single-connection pool
+        pool_args = {} if ":memory:" in url or url.rstrip("/") == "sqlite:" else {"poolclass": TimedQueuePool}
+        engine = create_engine(url, connect_args={"check_same_thread": False}, **pool_args)
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+        return engine
+
+    connect_args = {}
+    if DB_STATEMENT_TIMEOUT_MS and url.startswith("postgresql"):
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
+    return create_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+
+def pool_status(engine) -> dict:
+    """Connection pool counters, for sizing workers against the database."""
+    pool = engine.pool
+    stats = {"pool_class": type(pool).__name__, "status": pool.status()}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        counter = getattr(pool, name, None)
+        if callable(counter):
+            stats[name] = counter()
+    if "size" in stats:
+        stats["max_overflow"] = getattr(pool, "_max_overflow", None)
+        stats["timeout"] = getattr(pool, "_timeout", None)
+    return stats
+
+
+def _async_url(url: str) -> str:
+    """Map a sync database URL to its async driver."""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql:"):
+        return url.replace("postgresql:", "postgresql+asyncpg:", 1)
+    return url
+
+
+def create_async_db_engine(url: str):
+    """Async counterpart of create_db_engine, with the same settings."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    if url.startswith("sqlite"):
+        engine = create_async_engine(url)
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+        return engine
+
+    connect_args = {}
+    if DB_STATEMENT_TIMEOUT_MS and url.startswith("postgresql+asyncpg"):
+        connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+
+    return create_async_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+
+engine = create_db_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+replica_engine = create_db_engine(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else None
+ReadSessionLocal = (
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine) if replica_engine is not None else SessionLocal
+)
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    async_engine = create_async_db_engine(os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL))
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-def get_db():
+def get_db(request: Request, response: Response):
+    """Session on the primary, for handlers that write (or must read the latest data)."""
     db = SessionLocal()
+    # Commits put a consistency token on the response (versioning.py)
+    db.info["request"], db.info["response"] = request, response
     try:
         yield db
     finally:
         db.close()
+
+
+def _replica_session(request: Request) -> tuple:
+    """(session, source) for a read: the replica unless it is behind the request's token."""
+    db = ReadSessionLocal()
+    token = request.headers.get(CONSISTENCY_HEADER)
+    if not token:
+        return db, "replica"
+    # Imported here: versioning imports models, which import this module
+    import versioning
+    try:
+        if versioning.replica_caught_up(db, token):
+            return db, "replica"
+    except OperationalError:
+        pass
+    db.close()
+    return SessionLocal(), "primary"
+
+
+def get_read_db(request: Request, response: Response):
+    """
+    Session for read-only handlers. With DATABASE_REPLICA_URL set it reads
+    from the replica, falling back to the primary for requests whose
+    X-Consistency-Token names writes the replica has not replayed yet.
+    """
+    if replica_engine is None:
+        yield from get_db(request, response)
+        return
+    db, source = _replica_session(request)
+    response.headers["X-Read-Source"] = source
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class ThreadedSession:
+    """
+    Awaitable facade over a sync Session, used by async handlers when DB_ASYNC is off.
+    Each database call runs in the threadpool so the event loop is never blocked.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    async def execute(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, *args, **kwargs)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance):
+        await run_in_threadpool(self.sync_session.refresh, instance)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+
+async def get_async_db():
+    """
+    Session dependency for async handlers: an AsyncSession when DB_ASYNC=true,
+    otherwise the sync session wrapped in ThreadedSession.
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
+    db = ThreadedSession(SessionLocal(expire_on_commit=False))
+    try:
+        yield db
+    finally:
+        await db.close()
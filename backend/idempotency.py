@@ -0,0 +1,202 @@
+"""
+Idempotency-Key support for the operation endpoints.
+
+A client that retries a POST with the same Idempotency-Key header gets the
+stored response of the first successful attempt instead of a second stock
+movement. The key is claimed by inserting its row at the start of the
+request's transaction and the response is written into that row before the
+commit, so the stock change and its key commit (or roll back) together.
+Concurrent attempts with one key, from any worker, collide on the primary
+key: the loser waits for the winner's commit and replays its response.
+Failed requests (4xx/5xx) are rolled back with their claim and may be
+retried with the same key.
+
+Committed responses never change, so each process keeps recent ones in an
+LRU cache in front of the table; replays from the cache skip the database.
+Keys expire after IDEMPOTENCY_KEY_TTL_HOURS and are purged opportunistically.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import Header, HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from cache import TTLCache
+import models
+
+KEY_TTL = timedelta(hours=float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24")))
+CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+# Seconds between purges of expired keys, per process
+PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "600"))
+
+REPLAY_HEADER = "Idempotent-Replayed"
+
+_Recorded = namedtuple("_Recorded", "fingerprint status_code response expires_at")
+
+_PENDING = "idempotency_claim"
+_RECORDED = "idempotency_response"
+
+# key -> (fingerprint, status_code, body), for committed responses only
+_responses = TTLCache(maxsize=CACHE_SIZE, ttl=KEY_TTL.total_seconds())
+_next_purge = 0.0
+
+
+def key_header(
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", min_length=1, max_length=255),
+) -> Optional[str]:
+    return idempotency_key
+
+
+def _fingerprint(endpoint: str, payload) -> str:
+    body = payload.model_dump_json() if hasattr(payload, "model_dump_json") else json.dumps(payload, sort_keys=True)
+    return hashlib.sha256(f"{endpoint}\n{body}".encode()).hexdigest()
+
+
+def _replay(stored, fingerprint: str) -> JSONResponse:
+    stored_fingerprint, status_code, body = stored
+    if stored_fingerprint != fingerprint:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used for a different request",
+        )
+    return JSONResponse(content=json.loads(body), status_code=status_code, headers={REPLAY_HEADER: "true"})
+
+
+def _load(db: Session, key: str):
+    return db.execute(
+        select(
+            models.IdempotencyKey.fingerprint,
+            models.IdempotencyKey.status_code,
+            models.IdempotencyKey.response,
+            models.IdempotencyKey.expires_at,
+        ).where(models.IdempotencyKey.key == key)
+    ).first()
+
+
+def purge_expired(db: Session) -> int:
+    """Delete expired keys; returns how many."""
+    result = db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.expires_at < datetime.utcnow()))
+    db.commit()
+    return result.rowcount
+
+
+def _maybe_purge(db: Session):
+    global _next_purge
+    now = time.monotonic()
+    if now < _next_purge:
+        return
+    _next_purge = now + PURGE_INTERVAL
+    with Session(db.get_bind()) as purge_db:
+        purge_expired(purge_db)
+
+
+def begin(db: Session, key: Optional[str], endpoint: str, payload) -> Optional[JSONResponse]:
+    """
+    Claim `key` for this request, before any other write in the transaction.
+    Returns the stored response when the key was already used; raises 422 when
+    it was used for a different request and 409 when that request is still
+    running. Without a key this does nothing.
+    """
+    if key is None:
+        return None
+    fingerprint = _fingerprint(endpoint, payload)
+    stored = _responses.get(key)
+    if stored is not None:
+        return _replay(stored, fingerprint)
+
+    _maybe_purge(db)
+    now = datetime.utcnow()
+    row = _load(db, key)
+    if row is not None:
+        if row.expires_at >= now and row.response is not None:
+            return _replay(_remember(key, row), fingerprint)
+        # Expired but not purged yet: the key is free again
+        db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.key == key))
+
+    claim = models.IdempotencyKey(
+        key=key, endpoint=endpoint, fingerprint=fingerprint, created_at=now, expires_at=now + KEY_TTL,
+    )
+    db.add(claim)
+    try:
+        db.flush()
+    except IntegrityError:
+        # Another request claimed the key first; on PostgreSQL the insert
+        # waited for it to commit or roll back
+        db.rollback()
+        row = _load(db, key)
+        if row is None or row.response is None:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still in progress",
+            )
+        return _replay(_remember(key, row), fingerprint)
+    db.info[_PENDING] = claim
+    return None
+
+
+def record(db: Session, response_model, result, status_code: int = 200):
+    """Store the response for the key claimed by begin(); commits with the transaction."""
+    claim = db.info.get(_PENDING)
+    if claim is None:
+        return
+    claim.status_code = status_code
+    claim.response = json.dumps(response_model.model_validate(result).model_dump(mode="json"))
+    # Attributes expire on commit, so keep what the cache needs
+    db.info[_RECORDED] = (claim.key, _Recorded(claim.fingerprint, status_code, claim.response, claim.expires_at))
+
+
+def stored_responses(db: Session, keys) -> dict:
+    """Committed response bodies of the given keys that exist, by key."""
+    rows = db.execute(
+        select(models.IdempotencyKey.key, models.IdempotencyKey.response)
+        .where(models.IdempotencyKey.key.in_(list(keys)), models.IdempotencyKey.response.is_not(None))
+    ).all()
+    return {row.key: json.loads(row.response) for row in rows}
+
+
+def store_many(db: Session, endpoint: str, entries):
+    """Insert finished (key, payload, response body) triples in the current transaction."""
+    now = datetime.utcnow()
+    rows = [
+        {
+            "key": key,
+            "endpoint": endpoint,
+            "fingerprint": _fingerprint(endpoint, payload),
+            "status_code": 200,
+            "response": json.dumps(body),
+            "created_at": now,
+            "expires_at": now + KEY_TTL,
+        }
+        for key, payload, body in entries
+    ]
+    if rows:
+        db.execute(insert(models.IdempotencyKey), rows)
+
+
+def _remember(key: str, row):
+    """Cache a committed response until its key expires; returns the cache entry."""
+    stored = (row.fingerprint, row.status_code, row.response)
+    ttl = (row.expires_at - datetime.utcnow()).total_seconds()
+    if ttl > 0:
+        _responses.set(key, stored, ttl=ttl)
+    return stored
+
+
+@event.listens_for(Session, "after_commit")
+def _cache_committed(session):
+    session.info.pop(_PENDING, None)
+    recorded = session.info.pop(_RECORDED, None)
+    if recorded is not None:
+        _remember(*recorded)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_claim(session):
+    session.info.pop(_PENDING, None)
+    session.info.pop(_RECORDED, None)
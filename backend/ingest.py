@@ -0,0 +1,360 @@
+"""
+Write-behind queue for high-ingest bursts (POST /operations/queue/).
+
+Queued operations are validated, given an id and appended to a local
+SQLite file (INGEST_QUEUE_PATH) with one small commit, so the request never
+waits on the inventory rows. A background worker in each process claims
+the oldest entries, up to INGEST_BATCH_SIZE at a time, and applies each batch
+in one transaction on the main database through the bulk-operation path,
+which coalesces stock deltas per (product, warehouse).
+
+Every applied entry also stores its outcome in idempotency_keys under
+"ingest:<id>", in that same transaction. A claim left behind by a process
+that died mid-batch is taken over after INGEST_CLAIM_TIMEOUT seconds, and
+entries whose outcome is already stored are not applied a second time.
+
+Each claim counts as an attempt. An entry that was attempted before is
+claimed on its own, so one bad entry cannot keep failing the batch around
+it, and after INGEST_MAX_ATTEMPTS it is marked failed instead of retried.
+
+Workers on one host share the file, and IMMEDIATE transactions keep each
+claim exclusive. The queue is per host: an entry that is still queued is
+only visible on the host that accepted it, while applied entries can be
+looked up anywhere through idempotency_keys.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import (
+    Column, DateTime, Float, Index, Integer, MetaData, String, Table, bindparam, delete, event, func, insert,
+    inspect, or_, select, text, update,
+)
+from database import create_db_engine
+
+INGEST_QUEUE_ENABLED = os.getenv("INGEST_QUEUE_ENABLED", "false").lower() == "true"
+INGEST_QUEUE_PATH = os.getenv("INGEST_QUEUE_PATH", "./ingest_queue.db")
+# Entries applied per transaction on the main database
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+# Wait after a wake-up so a burst is applied as one batch
+INGEST_BATCH_DELAY_MS = float(os.getenv("INGEST_BATCH_DELAY_MS", "10"))
+INGEST_POLL_INTERVAL = float(os.getenv("INGEST_POLL_INTERVAL", "1"))
+INGEST_CLAIM_TIMEOUT = float(os.getenv("INGEST_CLAIM_TIMEOUT", "60"))
+# Claims of one entry before it is given up on as failed
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "5"))
+# Applied and failed entries stay in the queue file this long
+INGEST_RETENTION_HOURS = float(os.getenv("INGEST_RETENTION_HOURS", "24"))
+
+KEY_PREFIX = "ingest:"
+_PURGE_INTERVAL = 600  # seconds
+
+logger = logging.getLogger("stockmaster.ingest")
+
+_metadata = MetaData()
+
+queued_operations = Table(
+    "queued_operations",
+    _metadata,
+    Column("seq", Integer, primary_key=True, autoincrement=True),
+    Column("id", String(32), nullable=False, unique=True),
+    Column("payload", String, nullable=False),  # JSON of a schemas.BulkOperationItem
+    Column("status", String, nullable=False),  # queued, applying, applied, failed
+    Column("enqueued_at", DateTime, nullable=False),
+    Column("claimed_at", DateTime, nullable=True),
+    Column("attempts", Integer, nullable=False, server_default="0"),
+    Column("applied_at", DateTime, nullable=True),
+    Column("transaction_id", Integer, nullable=True),
+    Column("new_quantity", Float, nullable=True),
+    Column("message", String, nullable=True),
+    Index("ix_queued_operations_status_seq", "status", "seq"),
+)
+
+_engine = None
+_engine_lock = threading.Lock()
+_wakeup = threading.Event()
+
+
+def _begin_immediate(engine):
+    """
+    Take SQLite's write lock at BEGIN, so a claim cannot race another
+    process; connections from _reading() keep deferred transactions.
+    """
+
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN" if conn.get_execution_options().get("read_only") else "BEGIN IMMEDIATE")
+
+
+def _add_attempts(engine):
+    """Queue files created before attempts were counted lack the column."""
+    if "attempts" not in {column["name"] for column in inspect(engine).get_columns("queued_operations")}:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE queued_operations ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0"))
+
+
+def queue_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = create_db_engine(f"sqlite:///{INGEST_QUEUE_PATH}")
+                _begin_immediate(engine)
+                _metadata.create_all(engine)
+                _add_attempts(engine)
+                _engine = engine
+    return _engine
+
+
+def _reading():
+    return queue_engine().connect().execution_options(read_only=True)
+
+
+def result_key(entry_id: str) -> str:
+    """idempotency_keys key holding the outcome of an applied entry."""
+    return KEY_PREFIX + entry_id
+
+
+class _Appender:
+    """
+    Group commit for enqueue: while one request writes to the queue file,
+    concurrent requests line up and the next write takes all of them in one
+    transaction, instead of each waiting for the write lock and its own sync.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiting = []  # (rows, done event, [error])
+        self._writing = False
+
+    def append(self, rows: list):
+        done, error = threading.Event(), [None]
+        with self._lock:
+            self._waiting.append((rows, done, error))
+            leader = not self._writing
+            self._writing = True
+        if not leader:
+            done.wait()
+        else:
+            self._write_all()
+        if error[0] is not None:
+            raise error[0]
+
+    def _write_all(self):
+        while True:
+            with self._lock:
+                group, self._waiting = self._waiting, []
+                if not group:
+                    self._writing = False
+                    return
+            failure = None
+            try:
+                with queue_engine().begin() as conn:
+                    conn.execute(insert(queued_operations), [row for rows, _, _ in group for row in rows])
+            except Exception as e:
+                failure = e
+            for _, done, error in group:
+                error[0] = failure
+                done.set()
+
+
+_appender = _Appender()
+
+
+def enqueue(payloads: list) -> list:
+    """Append operations (JSON-ready dicts) to the queue; returns their entries."""
+    now = datetime.utcnow()
+    entries = [
+        {"id": uuid.uuid4().hex, "payload": json.dumps(payload), "status": "queued", "enqueued_at": now}
+        for payload in payloads
+    ]
+    if entries:
+        _appender.append(entries)
+        _wakeup.set()
+    return [{"id": entry["id"], "status": "queued"} for entry in entries]
+
+
+def claim(limit: int) -> list:
+    """
+    Mark up to `limit` of the oldest unclaimed (or abandoned) entries as
+    applying; returns (id, payload) pairs. An entry that was attempted before
+    is claimed alone.
+    """
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=INGEST_CLAIM_TIMEOUT)
+    with queue_engine().begin() as conn:
+        rows = conn.execute(
+            select(queued_operations.c.id, queued_operations.c.payload, queued_operations.c.attempts)
+            .where(or_(
+                queued_operations.c.status == "queued",
+                (queued_operations.c.status == "applying") & (queued_operations.c.claimed_at < stale),
+            ))
+            .order_by(queued_operations.c.seq)
+            .limit(limit)
+        ).all()
+        if rows and rows[0].attempts:
+            rows = rows[:1]
+        if rows:
+            conn.execute(
+                update(queued_operations)
+                .where(queued_operations.c.id.in_([row.id for row in rows]))
+                .values(status="applying", claimed_at=now, attempts=queued_operations.c.attempts + 1)
+            )
+    return [(row.id, json.loads(row.payload)) for row in rows]
+
+
+def release(entry_ids: list, error: Optional[str] = None):
+    """
+    Put claimed entries back in line after a failed attempt; entries out of
+    attempts are marked failed with the error instead.
+    """
+    given_up = queued_operations.c.attempts >= INGEST_MAX_ATTEMPTS
+    with queue_engine().begin() as conn:
+        conn.execute(
+            update(queued_operations)
+            .where(queued_operations.c.id.in_(entry_ids), given_up)
+            .values(
+                status="failed",
+                message=f"Gave up after {INGEST_MAX_ATTEMPTS} attempts: {error or 'apply failed'}",
+                applied_at=datetime.utcnow(),
+            )
+        )
+        conn.execute(
+            update(queued_operations)
+            .where(queued_operations.c.id.in_(entry_ids), ~given_up)
+            .values(status="queued", claimed_at=None)
+        )
+
+
+def complete(outcomes: dict):
+    """Record outcomes ({id: {status, transaction_id, new_quantity, message}}) of applied entries."""
+    now = datetime.utcnow()
+    with queue_engine().begin() as conn:
+        conn.execute(
+            update(queued_operations)
+            .where(queued_operations.c.id == bindparam("entry_id"))
+            .values(
+                status=bindparam("status"),
+                transaction_id=bindparam("transaction_id"),
+                new_quantity=bindparam("new_quantity"),
+                message=bindparam("message"),
+                applied_at=now,
+            ),
+            [{"entry_id": entry_id, **outcome} for entry_id, outcome in outcomes.items()],
+        )
+
+
+def get(entry_id: str):
+    with _reading() as conn:
+        return conn.execute(
+            select(
+                queued_operations.c.id,
+                queued_operations.c.status,
+                queued_operations.c.transaction_id,
+                queued_operations.c.new_quantity,
+                queued_operations.c.message,
+            ).where(queued_operations.c.id == entry_id)
+        ).mappings().first()
+
+
+def counts() -> dict:
+    """Number of entries per status."""
+    with _reading() as conn:
+        rows = conn.execute(
+            select(queued_operations.c.status, func.count()).group_by(queued_operations.c.status)
+        ).all()
+    return {"queued": 0, "applying": 0, "applied": 0, "failed": 0, **dict(rows)}
+
+
+def purge() -> int:
+    """Delete applied and failed entries past the retention period; returns how many."""
+    cutoff = datetime.utcnow() - timedelta(hours=INGEST_RETENTION_HOURS)
+    with queue_engine().begin() as conn:
+        result = conn.execute(
+            delete(queued_operations).where(
+                queued_operations.c.status.in_(("applied", "failed")),
+                queued_operations.c.applied_at < cutoff,
+            )
+        )
+    return result.rowcount
+
+
+class Worker:
+    """
+    Background thread draining the queue. apply_batch takes claimed
+    (id, payload) pairs, applies them in one transaction and returns their
+    outcomes by id; if it raises, the batch is released and its entries are
+    retried one by one, up to INGEST_MAX_ATTEMPTS each.
+    """
+
+    def __init__(self, apply_batch):
+        self.apply_batch = apply_batch
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ingest-worker", daemon=True)
+        self._next_purge = 0.0
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stopping.set()
+        _wakeup.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                if not self.drain_once():
+                    _wakeup.wait(INGEST_POLL_INTERVAL)
+                    _wakeup.clear()
+                    if INGEST_BATCH_DELAY_MS:
+                        time.sleep(INGEST_BATCH_DELAY_MS / 1000)
+                self._maybe_purge()
+            except Exception:
+                logger.exception("Ingest worker iteration failed")
+                self._stopping.wait(INGEST_POLL_INTERVAL)
+
+    def drain_once(self) -> int:
+        """Apply one batch; returns how many entries it held."""
+        entries = claim(INGEST_BATCH_SIZE)
+        if not entries:
+            return 0
+        try:
+            outcomes = self.apply_batch(entries)
+        except Exception as e:
+            release([entry_id for entry_id, _ in entries], str(e))
+            raise
+        complete(outcomes)
+        return len(entries)
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if now >= self._next_purge:
+            self._next_purge = now + _PURGE_INTERVAL
+            purge()
+
+
+_worker = None
+
+
+def start(apply_batch):
+    """Start this process's queue worker (idempotent)."""
+    global _worker
+    if _worker is None:
+        _worker = Worker(apply_batch)
+        _worker.start()
+    return _worker
+
+
+def stop():
+    global _worker
+    if _worker is not None:
+        _worker.stop()
+        _worker = None
@@ -0,0 +1,225 @@
+"""
+Stock history: snapshots, as-of reconstruction and archival of the ledger.
+
+A snapshot copies every inventory row at one instant. Stock at time T is
+rebuilt from the nearest snapshot plus the ledger between the two: rolled
+forward from the latest snapshot at or before T, or rolled back from the
+earliest one after it (or from live inventory when no snapshot exists).
+The ledger is every transaction with applied_at set, read from both the
+hot table and the archive, so archiving never changes an as-of answer.
+
+Archiving moves settled transactions older than a cutoff into
+transactions_archive, keyed by period (YYYY-MM), so the hot table only
+holds recent and pending rows. Archived rows can no longer change status.
+
+applied_at is when a receipt / delivery first reached inventory. Reverting
+it afterwards (or completing it again) keeps that movement and adds a
+"<type>_reversal" transaction (receipt_reversal, delivery_reversal)
+carrying the change, so the ledger after any snapshot still sums to live
+inventory. Reports count a reversal against the flow of the movement it
+undoes: a reverted delivery lowers outbound rather than adding inbound.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import case, delete, func, insert, literal, select, text, union_all
+from sqlalchemy.orm import Session
+
+import models
+
+ARCHIVE_BATCH_SIZE = 5000
+
+_LEDGER_COLUMNS = (
+    "id", "product_id", "warehouse_id", "transaction_type", "quantity",
+    "reference", "notes", "status", "timestamp", "applied_at",
+)
+
+
+def take_snapshot(db: Session) -> models.StockSnapshot:
+    """
+    Checkpoint all inventory rows. Writers are locked out for the duration of
+    the copy, and taken_at is read after the lock so every movement applied
+    before it is in the snapshot and every later one is in the ledger tail.
+    The caller commits.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("LOCK TABLE inventory IN SHARE MODE"))
+
+    snapshot = models.StockSnapshot(taken_at=datetime.utcnow())
+    db.add(snapshot)
+    # On SQLite this first write takes the database lock
+    db.flush()
+    snapshot.taken_at = datetime.utcnow()
+
+    result = db.execute(
+        insert(models.StockSnapshotLine).from_select(
+            ["snapshot_id", "product_id", "warehouse_id", "quantity"],
+            select(
+                literal(snapshot.id),
+                models.Inventory.product_id,
+                models.Inventory.warehouse_id,
+                func.coalesce(models.Inventory.quantity, 0),
+            ),
+        )
+    )
+    snapshot.row_count = result.rowcount
+    db.flush()
+    return snapshot
+
+
+def _ledger(product_id: Optional[int], warehouse_id: Optional[int], after=None, until=None, sign: int = 1):
+    """Signed applied movements in (after, until] from the hot table and the archive."""
+    parts = []
+    for table in (models.Transaction, models.TransactionArchive):
+        query = select(table.product_id, table.warehouse_id, (table.quantity * sign).label("quantity")).where(
+            table.applied_at.is_not(None),
+            table.warehouse_id.is_not(None),
+        )
+        if after is not None:
+            query = query.where(table.applied_at > after)
+        if until is not None:
+            query = query.where(table.applied_at <= until)
+        if product_id is not None:
+            query = query.where(table.product_id == product_id)
+        if warehouse_id is not None:
+            query = query.where(table.warehouse_id == warehouse_id)
+        parts.append(query)
+    return parts
+
+
+def movements(start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """
+    Applied movements in [start, end) from the hot table and the archive, as a
+    subquery of (product_id, warehouse_id, transaction_type, quantity, flow,
+    applied_at). transaction_type is the type of the movement booked, so a
+    delivery_reversal reads as "delivery"; flow carries the sign of that
+    movement (negative for outgoing), which a reversal's quantity does not.
+    """
+    parts = []
+    for table in (models.Transaction, models.TransactionArchive):
+        reversal = table.transaction_type.endswith(models.REVERSAL_SUFFIX, autoescape=True)
+        reversed_type = func.substr(
+            table.transaction_type, 1, func.length(table.transaction_type) - len(models.REVERSAL_SUFFIX)
+        )
+        booked_type = case((reversal, reversed_type), else_=table.transaction_type)
+        query = select(
+            table.product_id,
+            table.warehouse_id,
+            booked_type.label("transaction_type"),
+            table.quantity,
+            case((reversal, -table.quantity), else_=table.quantity).label("flow"),
+            table.applied_at,
+        ).where(table.applied_at.is_not(None), table.warehouse_id.is_not(None))
+        if start is not None:
+            query = query.where(table.applied_at >= start)
+        if end is not None:
+            query = query.where(table.applied_at < end)
+        parts.append(query)
+    return union_all(*parts).subquery("movements")
+
+
+def as_of_movements(db: Session, at: datetime, product_id: Optional[int] = None, warehouse_id: Optional[int] = None):
+    """
+    Base quantities plus signed ledger movements whose per-pair sum is the stock
+    at `at`. Returns (snapshot or None when rolled back from live inventory,
+    subquery of (product_id, warehouse_id, quantity)).
+    """
+    snapshot = db.execute(
+        select(models.StockSnapshot)
+        .where(models.StockSnapshot.taken_at <= at)
+        .order_by(models.StockSnapshot.taken_at.desc())
+        .limit(1)
+    ).scalar_one_or_none()
+    if snapshot is None:
+        snapshot = db.execute(
+            select(models.StockSnapshot)
+            .where(models.StockSnapshot.taken_at > at)
+            .order_by(models.StockSnapshot.taken_at)
+            .limit(1)
+        ).scalar_one_or_none()
+
+    if snapshot is not None:
+        line = models.StockSnapshotLine
+        base = select(line.product_id, line.warehouse_id, line.quantity).where(line.snapshot_id == snapshot.id)
+        if product_id is not None:
+            base = base.where(line.product_id == product_id)
+        if warehouse_id is not None:
+            base = base.where(line.warehouse_id == warehouse_id)
+        if snapshot.taken_at <= at:
+            tail = _ledger(product_id, warehouse_id, after=snapshot.taken_at, until=at)
+        else:
+            tail = _ledger(product_id, warehouse_id, after=at, until=snapshot.taken_at, sign=-1)
+    else:
+        inventory = models.Inventory
+        base = select(inventory.product_id, inventory.warehouse_id, func.coalesce(inventory.quantity, 0).label("quantity"))
+        if product_id is not None:
+            base = base.where(inventory.product_id == product_id)
+        if warehouse_id is not None:
+            base = base.where(inventory.warehouse_id == warehouse_id)
+        tail = _ledger(product_id, warehouse_id, after=at, sign=-1)
+
+    return snapshot, union_all(base, *tail).subquery()
+
+
+def stock_as_of(db: Session, at: datetime, product_id: Optional[int] = None, warehouse_id: Optional[int] = None):
+    """
+    Quantity per (product_id, warehouse_id) at `at`.
+    Returns (snapshot or None when rolled back from live inventory, rows).
+    """
+    snapshot, moves = as_of_movements(db, at, product_id=product_id, warehouse_id=warehouse_id)
+    rows = db.execute(
+        select(
+            moves.c.product_id,
+            moves.c.warehouse_id,
+            func.sum(moves.c.quantity).label("quantity"),
+        )
+        .group_by(moves.c.product_id, moves.c.warehouse_id)
+        .order_by(moves.c.product_id, moves.c.warehouse_id)
+    ).all()
+    return snapshot, rows
+
+
+def _period(db: Session, column):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+
+def archive_transactions(db: Session, before: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Move transactions applied before `before` into transactions_archive.
+    Pending receipts/deliveries stay in the hot table. Commits once per batch
+    so no single transaction holds locks on the whole range.
+    """
+    hot = models.Transaction
+    moved = 0
+    while True:
+        ids = db.scalars(
+            select(hot.id)
+            .where(hot.applied_at.is_not(None), hot.applied_at < before)
+            .order_by(hot.id)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            return moved
+
+        db.execute(
+            insert(models.TransactionArchive).from_select(
+                ["period", *_LEDGER_COLUMNS],
+                select(_period(db, hot.applied_at), *(getattr(hot, name) for name in _LEDGER_COLUMNS))
+                .where(hot.id.in_(ids)),
+            )
+        )
+        db.execute(delete(hot).where(hot.id.in_(ids)))
+        db.commit()
+        moved += len(ids)
+
+
+def archive_periods(db: Session):
+    """(period, transaction count) for every archived period, oldest first."""
+    archive = models.TransactionArchive
+    return db.execute(
+        select(archive.period, func.count(archive.id).label("transactions"))
+        .group_by(archive.period)
+        .order_by(archive.period)
+    ).all()
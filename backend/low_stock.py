@@ -0,0 +1,134 @@
+"""
+Low-stock alerts maintained incrementally at commit time.
+
+low_stock_alerts holds one row per (product, warehouse) whose quantity is
+at or below its reorder point. Before each commit only the pairs the stock
+helpers (or a reorder point change) touched in that transaction are
+re-evaluated, so an operation costs one lookup over its own rows and the
+alert list is read without scanning inventory.
+
+rebuild_alerts recomputes the table from scratch for existing databases.
+"""
+from datetime import datetime
+
+from sqlalchemy import delete, event, func, insert, literal, select, tuple_
+from sqlalchemy.orm import Session
+
+import models
+import stock
+
+# Pairs per evaluation query; keeps SQLite under its bound-parameter limit
+_CHUNK_SIZE = 400
+
+# Reorder point given to seeded pairs and to stock that predates reorder points
+DEFAULT_REORDER_POINT = 5
+
+
+def _below_threshold():
+    """(product_id, warehouse_id, quantity, reorder_point) for pairs at or below their reorder point."""
+    quantity = func.coalesce(models.Inventory.quantity, 0)
+    return (
+        select(
+            models.ReorderPoint.product_id,
+            models.ReorderPoint.warehouse_id,
+            quantity.label("quantity"),
+            models.ReorderPoint.reorder_point,
+        )
+        .outerjoin(
+            models.Inventory,
+            (models.Inventory.product_id == models.ReorderPoint.product_id)
+            & (models.Inventory.warehouse_id == models.ReorderPoint.warehouse_id),
+        )
+        .where(quantity <= models.ReorderPoint.reorder_point)
+    )
+
+
+def evaluate(db: Session, pairs):
+    """Open, update or close the alerts of the given (product_id, warehouse_id) pairs."""
+    pairs = sorted(pairs)
+    now = datetime.utcnow()
+    for start in range(0, len(pairs), _CHUNK_SIZE):
+        chunk = pairs[start:start + _CHUNK_SIZE]
+        low = {
+            (row.product_id, row.warehouse_id): row
+            for row in db.execute(
+                _below_threshold().where(
+                    tuple_(models.ReorderPoint.product_id, models.ReorderPoint.warehouse_id).in_(chunk)
+                )
+            )
+        }
+        open_alerts = {
+            (alert.product_id, alert.warehouse_id): alert
+            for alert in db.scalars(
+                select(models.LowStockAlert).where(
+                    tuple_(models.LowStockAlert.product_id, models.LowStockAlert.warehouse_id).in_(chunk)
+                )
+            )
+        }
+
+        for key, alert in open_alerts.items():
+            row = low.get(key)
+            if row is None:
+                db.delete(alert)
+            else:
+                alert.quantity = row.quantity
+                alert.reorder_point = row.reorder_point
+        for key, row in low.items():
+            if key not in open_alerts:
+                db.add(models.LowStockAlert(
+                    product_id=row.product_id,
+                    warehouse_id=row.warehouse_id,
+                    quantity=row.quantity,
+                    reorder_point=row.reorder_point,
+                    raised_at=now,
+                ))
+    db.flush()
+
+
+def _evaluate_touched(session):
+    session.flush()
+    pairs = session.info.pop(stock.TOUCHED_PAIRS, None)
+    if pairs:
+        evaluate(session, pairs)
+
+
+# Runs ahead of the version-stamp bump so alert writes are counted in the same commit
+event.listen(Session, "before_commit", _evaluate_touched, insert=True)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_touched(session):
+    session.info.pop(stock.TOUCHED_PAIRS, None)
+
+
+def backfill_reorder_points(db: Session) -> int:
+    """
+    Give every inventory pair DEFAULT_REORDER_POINT when no reorder point
+    exists at all, so databases from before reorder points keep flagging low
+    stock. Returns how many were added; the caller commits.
+    """
+    if db.execute(select(models.ReorderPoint.product_id).limit(1)).first() is not None:
+        return 0
+    result = db.execute(
+        insert(models.ReorderPoint).from_select(
+            ["product_id", "warehouse_id", "reorder_point"],
+            select(
+                models.Inventory.product_id,
+                models.Inventory.warehouse_id,
+                literal(DEFAULT_REORDER_POINT),
+            ).where(models.Inventory.product_id.is_not(None), models.Inventory.warehouse_id.is_not(None)),
+        )
+    )
+    return result.rowcount
+
+
+def rebuild_alerts(db: Session):
+    """Recompute low_stock_alerts from inventory and reorder points. The caller commits."""
+    db.execute(delete(models.LowStockAlert))
+    below = _below_threshold().subquery()
+    db.execute(
+        insert(models.LowStockAlert).from_select(
+            ["product_id", "warehouse_id", "quantity", "reorder_point", "raised_at"],
+            select(below.c.product_id, below.c.warehouse_id, below.c.quantity, below.c.reorder_point, func.current_timestamp()),
+        )
+    )
@@ -1,4 +1,6 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from pathlib import Path
@@ -9,21 +11,36 @@ import sys
 # Add backend directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from database import engine, Base
-import models
-from routers import products, warehouses, operations, auth
+from database import engine, pool_status, replica_engine
+import ingest
+import metrics
+import migrations
+from routers import products, warehouses, operations, auth, events, history, reports, alerts, exports, imports
 
 env_path = Path(__file__).parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
-# Create tables
-models.Base.metadata.create_all(bind=engine)
+# Upgrade an outdated schema on startup instead of refusing to start (run bootstrap.py per deploy otherwise)
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "true").lower() == "true"
+# Load the sample catalog into an empty database on startup
+SEED_DATABASE = os.getenv("SEED_DATABASE", "false").lower() == "true"
 
-# Seed database with sample data
-from seed_data import seed_database
-seed_database()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One schema_version lookup when the database is current
+    migrations.ensure_schema(engine, AUTO_MIGRATE)
+    if SEED_DATABASE:
+        from seed_data import seed_database
+        seed_database()
+    if ingest.INGEST_QUEUE_ENABLED:
+        ingest.start(operations.apply_queued)
+    yield
+    ingest.stop()
+    engine.dispose()
+    if replica_engine is not None:
+        replica_engine.dispose()
 
-app = FastAPI(title="StockMaster API", description="Inventory Management System Backend")
+app = FastAPI(title="StockMaster API", description="Inventory Management System Backend", lifespan=lifespan)
 
 # Production CORS Configuration
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
@@ -46,6 +63,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Consistency-Token"],
 )
 
 @app.get("/")
@@ -56,10 +74,34 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/pool")
+def pool_health():
+    """Database connection pool statistics"""
+    stats = pool_status(engine)
+    if replica_engine is not None:
+        stats["replica"] = pool_status(replica_engine)
+    return stats
+
+if metrics.METRICS_ENABLED:
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    def read_metrics():
+        """Per-process request, SQL and pool metrics in Prometheus text format"""
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Add Session Middleware for Authlib
 app.add_middleware(SessionMiddleware, secret_key=os.getenv("SECRET_KEY", "secret"))
 
+# Outermost, so timings cover the other middleware too
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(auth.router)
 app.include_router(products.router)
 app.include_router(warehouses.router)
 app.include_router(operations.router)
+app.include_router(events.router)
+app.include_router(history.router)
+app.include_router(reports.router)
+app.include_router(alerts.router)
+app.include_router(exports.router)
+app.include_router(imports.router)
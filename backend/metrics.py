@@ -0,0 +1,252 @@
+"""
+Request-level performance metrics, exposed on /metrics in Prometheus text format.
+
+MetricsMiddleware times every HTTP request per route template (including
+streamed bodies) and records the response size. SQLAlchemy cursor events
+count each request's SQL statements and the time spent in them; the request
+is tracked through a context variable, which threadpool handlers inherit.
+TimedQueuePool (database.py) reports how long connection checkouts waited.
+
+Statements slower than SLOW_QUERY_MS are logged to the "stockmaster.sql"
+logger, and so is any identical statement run N_PLUS_ONE_THRESHOLD times or
+more within one request, the usual sign of a per-row query in a loop.
+
+Everything is kept in process, so each worker exposes its own series;
+scrape every worker (or run one per container) as with any
+multi-process server.
+"""
+import collections
+import contextvars
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Log statements slower than this (0 = off)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# Log a statement repeated this many times in one request (0 = off)
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+
+logger = logging.getLogger("stockmaster.sql")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values = collections.defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] += amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.label_names, labels)} {value:g}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._series.items())
+        bounds = [f'le="{bound:g}"' for bound in self.buckets] + ['le="+Inf"']
+        for labels, values in series:
+            counts = values[:len(self.buckets)] + [values[-1]]
+            for bound, count in zip(bounds, counts):
+                yield f"{self.name}_bucket{_labels(self.label_names, labels, bound)} {count}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {values[-2]:g}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {values[-1]}"
+
+
+REGISTRY = []
+
+
+def _register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+REQUESTS = _register(Counter(
+    "http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")))
+REQUEST_SECONDS = _register(Histogram(
+    "http_request_duration_seconds", "Time to the end of the response body.", ("method", "route")))
+RESPONSE_BYTES = _register(Histogram(
+    "http_response_size_bytes", "Response body size.", ("method", "route"), SIZE_BUCKETS))
+REQUEST_STATEMENTS = _register(Histogram(
+    "http_request_db_statements", "SQL statements executed per request.", ("method", "route"), COUNT_BUCKETS))
+REQUEST_DB_SECONDS = _register(Histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per request.", ("method", "route")))
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+POOL_WAIT_SECONDS = _register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time to check a connection out of the pool.", buckets=POOL_WAIT_BUCKETS))
+REQUEST_POOL_WAIT_SECONDS = _register(Histogram(
+    "http_request_db_pool_wait_seconds", "Connection checkout wait per request.", ("method", "route"), POOL_WAIT_BUCKETS))
+SLOW_QUERIES = _register(Counter(
+    "db_slow_queries_total", "Statements slower than SLOW_QUERY_MS.", ("route",)))
+REPEATED_STATEMENTS = _register(Counter(
+    "db_repeated_statements_total", "Requests that repeated one statement N_PLUS_ONE_THRESHOLD+ times.", ("route",)))
+PASSWORD_HASH_SECONDS = _register(Histogram(
+    "password_hash_seconds", "bcrypt hash/verify time including the wait for a hash worker.",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)))
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class RequestStats:
+    __slots__ = ("scope", "statements", "db_seconds", "pool_wait", "seen")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.pool_wait = 0.0
+        self.seen = collections.Counter()
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+_START = "metrics_statement_started"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(_START, []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info[_START].pop()
+    elapsed = time.perf_counter() - started
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+        stats.seen[statement] += 1
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        route = _route_label(stats.scope) if stats else "background"
+        SLOW_QUERIES.inc(route)
+        logger.warning("Slow query (%.0f ms) in %s: %s", elapsed * 1000, route, _shorten(statement))
+
+
+@event.listens_for(Engine, "handle_error")
+def _forget_failed_statement(context):
+    started = context.connection.info.get(_START) if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def observe_pool_wait(seconds: float):
+    POOL_WAIT_SECONDS.observe(seconds)
+    stats = _current.get()
+    if stats is not None:
+        stats.pool_wait += seconds
+
+
+def _shorten(statement: str, length: int = 300) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= length else statement[:length] + "..."
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed responses are timed to their last chunk."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            method = scope["method"]
+            route = _route_label(scope)
+            REQUESTS.inc(method, route, str(status))
+            REQUEST_SECONDS.observe(time.perf_counter() - started, method, route)
+            RESPONSE_BYTES.observe(size, method, route)
+            REQUEST_STATEMENTS.observe(stats.statements, method, route)
+            REQUEST_DB_SECONDS.observe(stats.db_seconds, method, route)
+            REQUEST_POOL_WAIT_SECONDS.observe(stats.pool_wait, method, route)
+            _check_repeats(stats, method, route)
+
+
+def _check_repeats(stats: RequestStats, method: str, route: str):
+    if not N_PLUS_ONE_THRESHOLD or not stats.seen:
+        return
+    statement, count = stats.seen.most_common(1)[0]
+    if count >= N_PLUS_ONE_THRESHOLD:
+        REPEATED_STATEMENTS.inc(route)
+        logger.warning(
+            "Possible N+1: %s %s ran the same statement %d times (%d statements in total): %s",
+            method, route, count, stats.statements, _shorten(statement),
+        )
@@ -0,0 +1,177 @@
+"""
+Schema bootstrap and idempotent upgrades for databases created before a
+model change.
+
+Base.metadata.create_all only creates missing tables; columns and indexes
+added to existing tables, and backfills, are applied here. The applied
+revision is recorded in schema_version, so a start against a current
+database costs one lookup. Bump SCHEMA_VERSION with every model change.
+
+Run `python bootstrap.py` once per deploy; the app's startup hook only
+checks the revision (and upgrades itself when AUTO_MIGRATE is on).
+"""
+from contextlib import contextmanager
+from sqlalchemy import delete, func, inspect, or_, select, text, update
+from sqlalchemy.orm import Session
+from database import Base
+import low_stock
+import models
+import search
+import stock
+import versioning
+
+
+def _merge_duplicate_inventory(db: Session):
+    """Fold duplicate (product_id, warehouse_id) rows into the oldest one."""
+    duplicates = db.execute(
+        select(
+            models.Inventory.product_id,
+            models.Inventory.warehouse_id,
+            func.min(models.Inventory.id).label("keep_id"),
+            func.sum(models.Inventory.quantity).label("quantity"),
+        )
+        .group_by(models.Inventory.product_id, models.Inventory.warehouse_id)
+        .having(func.count(models.Inventory.id) > 1)
+    ).all()
+
+    for row in duplicates:
+        db.execute(
+            update(models.Inventory)
+            .where(models.Inventory.id == row.keep_id)
+            .values(quantity=row.quantity)
+        )
+        db.execute(
+            delete(models.Inventory).where(
+                models.Inventory.product_id == row.product_id,
+                models.Inventory.warehouse_id == row.warehouse_id,
+                models.Inventory.id != row.keep_id,
+            )
+        )
+    return len(duplicates)
+
+
+def _add_applied_at(engine):
+    """Add transactions.applied_at and backfill it for movements already in inventory."""
+    columns = {column["name"] for column in inspect(engine).get_columns("transactions")}
+    if "applied_at" in columns:
+        return
+    column_type = models.Transaction.__table__.c.applied_at.type.compile(dialect=engine.dialect)
+    transaction = models.Transaction
+    applied = or_(
+        transaction.transaction_type.not_in(list(models.STOCK_APPLIED_STATUS)),
+        *(
+            (transaction.transaction_type == kind) & (transaction.status == status)
+            for kind, status in models.STOCK_APPLIED_STATUS.items()
+        ),
+    )
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE transactions ADD COLUMN applied_at {column_type}"))
+        conn.execute(update(transaction).where(applied).values(applied_at=transaction.timestamp))
+    print("Added transactions.applied_at")
+
+
+def _add_credentials_changed_at(engine):
+    """Add users.credentials_changed_at; existing users have no reset to honour."""
+    columns = {column["name"] for column in inspect(engine).get_columns("users")}
+    if "credentials_changed_at" in columns:
+        return
+    column_type = models.User.__table__.c.credentials_changed_at.type.compile(dialect=engine.dialect)
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE users ADD COLUMN credentials_changed_at {column_type}"))
+    print("Added users.credentials_changed_at")
+
+
+SCHEMA_VERSION = 5
+
+# pg_advisory_lock key serializing bootstraps across workers and instances
+_MIGRATION_LOCK_KEY = 0x53544B4D  # "STKM"
+
+
+def current_version(engine) -> int:
+    """Applied schema revision; 0 for an empty or pre-versioning database."""
+    if not inspect(engine).has_table(models.SchemaVersion.__tablename__):
+        return 0
+    with engine.connect() as conn:
+        return conn.execute(select(func.max(models.SchemaVersion.version))).scalar() or 0
+
+
+@contextmanager
+def _migration_lock(engine):
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _MIGRATION_LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _MIGRATION_LOCK_KEY})
+
+
+def upgrade(engine) -> bool:
+    """
+    Create and upgrade the schema to SCHEMA_VERSION. Concurrent callers on
+    PostgreSQL wait for the first one and then find nothing to do.
+    Returns whether anything was applied.
+    """
+    with _migration_lock(engine):
+        if current_version(engine) >= SCHEMA_VERSION:
+            return False
+        Base.metadata.create_all(bind=engine)
+        _apply(engine)
+        with Session(engine) as db:
+            db.add(models.SchemaVersion(version=SCHEMA_VERSION))
+            db.commit()
+    return True
+
+
+def ensure_schema(engine, auto_migrate: bool):
+    """Startup check: upgrade when allowed, otherwise refuse to serve an outdated schema."""
+    version = current_version(engine)
+    if version >= SCHEMA_VERSION:
+        return
+    if not auto_migrate:
+        raise RuntimeError(
+            f"Database schema is at revision {version}, expected {SCHEMA_VERSION}; run python bootstrap.py"
+        )
+    upgrade(engine)
+
+
+def _apply(engine):
+    """Bring an existing database up to the current models."""
+    with Session(engine) as db:
+        merged = _merge_duplicate_inventory(db)
+        db.commit()
+    if merged:
+        print(f"Merged duplicate inventory rows for {merged} product/warehouse pairs")
+
+    _add_applied_at(engine)
+    _add_credentials_changed_at(engine)
+
+    for table in (models.Inventory.__table__, models.Transaction.__table__):
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    search.install(engine)
+
+    with Session(engine) as db:
+        versioning.ensure_stamps(db)
+
+        # Backfill materialized totals on databases that predate product_stock
+        if db.execute(select(models.ProductStock.product_id).limit(1)).first() is None:
+            stock.rebuild_totals(db)
+            db.commit()
+
+        # Default reorder points for stock that predates them
+        added = low_stock.backfill_reorder_points(db)
+        db.commit()
+        if added:
+            print(f"Added default reorder point {low_stock.DEFAULT_REORDER_POINT} for {added} product/warehouse pairs")
+
+        # Open alerts for reorder points set before alerts were maintained
+        if (
+            db.execute(select(models.LowStockAlert.product_id).limit(1)).first() is None
+            and db.execute(select(models.ReorderPoint.product_id).limit(1)).first() is not None
+        ):
+            low_stock.rebuild_alerts(db)
+            db.commit()
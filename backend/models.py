@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Float
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Float, Index, Boolean
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from datetime import datetime
 import enum
 from database import Base
 
@@ -19,6 +20,8 @@ class User(Base):
     role = Column(String, default="staff") # manager, staff
     reset_otp = Column(String, nullable=True)
     otp_expires_at = Column(DateTime, nullable=True)
+    # Unix time (sub-second) of the last password reset; tokens issued before it are rejected
+    credentials_changed_at = Column(Float, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
 
 class Warehouse(Base):
@@ -51,17 +54,164 @@ class Inventory(Base):
     product = relationship("Product", back_populates="inventory")
     warehouse = relationship("Warehouse", back_populates="inventory")
 
+    __table_args__ = (
+        # One row per (product, warehouse); also the ON CONFLICT target of stock.add_stock
+        Index("ix_inventory_product_warehouse", "product_id", "warehouse_id", unique=True),
+    )
+
+class ProductStock(Base):
+    """Total quantity of a product across warehouses, kept in step with Inventory by stock.py."""
+    __tablename__ = "product_stock"
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    quantity = Column(Float, nullable=False, default=0.0)
+
+# Status at which a receipt / delivery moves stock; every other type moves it on creation
+STOCK_APPLIED_STATUS = {"receipt": "COMPLETED", "delivery": "SHIPPED"}
+
+# Type suffix of the rows that undo (or redo) an applied receipt / delivery
+REVERSAL_SUFFIX = "_reversal"
+
+def affects_stock(transaction_type: str, status: str) -> bool:
+    required = STOCK_APPLIED_STATUS.get(transaction_type)
+    return required is None or status == required
+
+def _default_applied_at(context):
+    params = context.get_current_parameters()
+    if affects_stock(params.get("transaction_type"), params.get("status")):
+        return params.get("timestamp") or datetime.utcnow()
+    return None
+
+class ReorderPoint(Base):
+    """Per-warehouse threshold at or below which a product is low on stock."""
+    __tablename__ = "reorder_points"
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), primary_key=True)
+    reorder_point = Column(Float, nullable=False)
+
+class LowStockAlert(Base):
+    """Open low-stock alerts, one per pair at or below its reorder point; kept by low_stock.py."""
+    __tablename__ = "low_stock_alerts"
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), primary_key=True)
+    quantity = Column(Float, nullable=False)
+    reorder_point = Column(Float, nullable=False)
+    raised_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_low_stock_alerts_warehouse", "warehouse_id"),
+    )
+
 class Transaction(Base):
     __tablename__ = "transactions"
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=True)
-    transaction_type = Column(String, index=True)  # receipt, delivery, transfer_in, transfer_out, adjustment
+    transaction_type = Column(String, index=True)  # receipt, delivery, transfer_in, transfer_out, adjustment, receipt_reversal, delivery_reversal
     quantity = Column(Float)
     reference = Column(String, nullable=True)
     notes = Column(String, nullable=True)
     status = Column(String, default="ORDER_PLACED")  # For receipts: ORDER_PLACED, IN_TRANSIT, COMPLETED; For deliveries: ORDER_RECEIVED, SHIPPING, SHIPPED
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    # When the quantity hit inventory; NULL while a receipt/delivery is still pending
+    applied_at = Column(DateTime(timezone=True), nullable=True, default=_default_applied_at)
     
     product = relationship("Product", back_populates="transactions")
     warehouse = relationship("Warehouse")
+
+    __table_args__ = (
+        # Keyset pagination of the recent operations feed
+        Index("ix_transactions_timestamp_id", "timestamp", "id"),
+        # Ledger tail replay for as-of stock queries
+        Index("ix_transactions_applied_at", "applied_at"),
+    )
+
+class TransactionArchive(Base):
+    """
+    Settled transactions moved out of the hot table by ledger.archive_transactions.
+    Rows keep their original id; period (YYYY-MM of applied_at) is the partition key.
+    """
+    __tablename__ = "transactions_archive"
+    id = Column(Integer, primary_key=True)
+    period = Column(String(7), nullable=False)
+    product_id = Column(Integer, nullable=False)
+    warehouse_id = Column(Integer, nullable=True)
+    transaction_type = Column(String, nullable=False)
+    quantity = Column(Float, nullable=False)
+    reference = Column(String, nullable=True)
+    notes = Column(String, nullable=True)
+    status = Column(String)
+    timestamp = Column(DateTime(timezone=True))
+    applied_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_transactions_archive_period_id", "period", "id"),
+        Index("ix_transactions_archive_applied_at", "applied_at"),
+    )
+
+class StockSnapshot(Base):
+    """Checkpoint of every inventory row at taken_at, the base for as-of queries."""
+    __tablename__ = "stock_snapshots"
+    id = Column(Integer, primary_key=True, index=True)
+    taken_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    row_count = Column(Integer, nullable=False, default=0)
+
+    lines = relationship("StockSnapshotLine", cascade="all, delete-orphan")
+
+class StockSnapshotLine(Base):
+    __tablename__ = "stock_snapshot_lines"
+    snapshot_id = Column(Integer, ForeignKey("stock_snapshots.id", ondelete="CASCADE"), primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    warehouse_id = Column(Integer, primary_key=True)
+    quantity = Column(Float, nullable=False)
+
+class VersionStamp(Base):
+    """Change counter per table, bumped on commit; backs the ETags of list endpoints."""
+    __tablename__ = "version_stamps"
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class ImportJob(Base):
+    """Progress of a bulk catalog import; rows_processed is the resume checkpoint."""
+    __tablename__ = "import_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String, nullable=True)
+    format = Column(String, nullable=False)  # csv, ndjson
+    status = Column(String, nullable=False, default="running")  # running, completed, failed
+    update_existing = Column(Boolean, nullable=False, default=False)
+    rows_processed = Column(Integer, nullable=False, default=0)
+    products_created = Column(Integer, nullable=False, default=0)
+    products_updated = Column(Integer, nullable=False, default=0)
+    stock_rows = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)
+    message = Column(String, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class ImportJobError(Base):
+    __tablename__ = "import_job_errors"
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey("import_jobs.id", ondelete="CASCADE"), nullable=False)
+    row_number = Column(Integer, nullable=False)
+    sku = Column(String, nullable=True)
+    message = Column(String, nullable=False)
+
+    __table_args__ = (
+        Index("ix_import_job_errors_job_row", "job_id", "row_number"),
+    )
+
+class IdempotencyKey(Base):
+    """Response of an operation request, replayed to retries carrying the same Idempotency-Key."""
+    __tablename__ = "idempotency_keys"
+    key = Column(String(255), primary_key=True)
+    endpoint = Column(String, nullable=False)
+    fingerprint = Column(String(64), nullable=False)  # sha256 of endpoint + request body
+    status_code = Column(Integer, nullable=True)
+    response = Column(String, nullable=True)  # JSON body; NULL while the claiming request runs
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class SchemaVersion(Base):
+    """Revisions applied by migrations.upgrade; the highest is the current schema."""
+    __tablename__ = "schema_version"
+    version = Column(Integer, primary_key=True)
+    applied_at = Column(DateTime, server_default=func.now())
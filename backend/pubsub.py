@@ -0,0 +1,81 @@
+"""
+In-process pub/sub hub for pushing inventory changes to connected clients.
+
+Handlers publish after they commit; the /events/stream endpoint relays
+messages to browsers as Server-Sent Events. The hub only reaches clients
+connected to the same process; to fan out across workers, install a
+broker-backed object with the same publish/subscribe/unsubscribe methods
+via set_hub().
+"""
+import asyncio
+import json
+import threading
+
+# Messages buffered per subscriber before it is told to resync
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+class Subscription:
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def _deliver(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class InProcessHub:
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> Subscription:
+        """Register a subscriber; must be called from the event loop that will read it."""
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event: str, data):
+        """Send an event to every subscriber. Safe to call from threadpool handlers."""
+        message = (event, json.dumps(data, default=str))
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._deliver, message)
+            except RuntimeError:
+                # Subscriber's loop already closed
+                self.unsubscribe(subscription)
+
+
+hub = InProcessHub()
+
+
+def set_hub(new_hub):
+    global hub
+    hub = new_hub
+
+
+def get_hub():
+    return hub
+
+
+def publish_inventory(changes: list):
+    """changes: [{"product_id", "warehouse_id", "quantity", "delta"}, ...]"""
+    if changes:
+        hub.publish("inventory", changes)
+
+
+def publish_transactions(transactions: list):
+    """transactions: rows shaped like schemas.TransactionHistory"""
+    if transactions:
+        hub.publish("transaction", transactions)
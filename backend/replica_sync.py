@@ -0,0 +1,61 @@
+"""
+Keep a local SQLite read replica in step with the primary, for trying out
+DATABASE_REPLICA_URL without a PostgreSQL standby.
+
+    python replica_sync.py                  # copy once
+    python replica_sync.py --interval 2     # copy every 2 seconds (simulated lag)
+
+Both DATABASE_URL and DATABASE_REPLICA_URL must be sqlite:/// file URLs.
+Each pass copies the whole primary with SQLite's online backup API, so
+readers of the replica see one consistent snapshot at a time. PostgreSQL
+replicas come from streaming replication instead.
+"""
+import argparse
+import sqlite3
+import sys
+import time
+
+from sqlalchemy.engine import make_url
+
+from database import DATABASE_REPLICA_URL, DATABASE_URL
+
+
+def _sqlite_path(url: str):
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or not parsed.database or parsed.database == ":memory:":
+        return None
+    return parsed.database
+
+
+def copy(primary_path: str, replica_path: str):
+    source = sqlite3.connect(primary_path)
+    target = sqlite3.connect(replica_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy the SQLite primary to the SQLite replica")
+    parser.add_argument("--interval", type=float, default=0, help="seconds between copies (0: copy once)")
+    args = parser.parse_args()
+
+    primary_path = _sqlite_path(DATABASE_URL)
+    replica_path = _sqlite_path(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else None
+    if not primary_path or not replica_path:
+        print("❌ DATABASE_URL and DATABASE_REPLICA_URL must both be sqlite:/// file URLs")
+        sys.exit(1)
+
+    while True:
+        started = time.perf_counter()
+        copy(primary_path, replica_path)
+        print(f"✅ Copied {primary_path} to {replica_path} in {(time.perf_counter() - started) * 1000:.0f} ms")
+        if not args.interval:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
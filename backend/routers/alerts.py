@@ -0,0 +1,113 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+from typing import List, Optional
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import models, schemas, stock, versioning
+from database import get_db, get_read_db
+
+router = APIRouter(
+    prefix="/alerts",
+    tags=["alerts"],
+)
+
+@router.get("/low-stock", response_model=List[schemas.LowStockAlert])
+def read_low_stock_alerts(
+    request: Request,
+    response: Response,
+    warehouse_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    """
+    Pairs at or below their reorder point, read from the maintained alert table.
+    Pass the X-Next-Cursor header of the previous page ("product_id:warehouse_id")
+    as `cursor` for the next page.
+    """
+    cached = versioning.not_modified(request, response, db, ("inventory", "products", "warehouses"))
+    if cached:
+        return cached
+
+    alert = models.LowStockAlert
+    query = (
+        select(
+            alert.product_id,
+            models.Product.name.label("product_name"),
+            models.Product.sku,
+            alert.warehouse_id,
+            models.Warehouse.name.label("warehouse_name"),
+            alert.quantity,
+            alert.reorder_point,
+            alert.raised_at,
+        )
+        .join(models.Product, models.Product.id == alert.product_id)
+        .join(models.Warehouse, models.Warehouse.id == alert.warehouse_id)
+        .order_by(alert.product_id, alert.warehouse_id)
+    )
+    if warehouse_id is not None:
+        query = query.where(alert.warehouse_id == warehouse_id)
+    if cursor is not None:
+        try:
+            after = tuple(int(part) for part in cursor.split(":"))
+        except ValueError:
+            after = ()
+        if len(after) != 2:
+            raise HTTPException(status_code=400, detail="cursor must be product_id:warehouse_id")
+        query = query.where(tuple_(alert.product_id, alert.warehouse_id) > after)
+
+    rows = [row._asdict() for row in db.execute(query.limit(limit))]
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = f"{rows[-1]['product_id']}:{rows[-1]['warehouse_id']}"
+    return rows
+
+@router.get("/reorder-points", response_model=List[schemas.ReorderPoint])
+def read_reorder_points(
+    product_id: Optional[int] = None,
+    warehouse_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    query = select(models.ReorderPoint).order_by(models.ReorderPoint.product_id, models.ReorderPoint.warehouse_id)
+    if product_id is not None:
+        query = query.where(models.ReorderPoint.product_id == product_id)
+    if warehouse_id is not None:
+        query = query.where(models.ReorderPoint.warehouse_id == warehouse_id)
+    return db.scalars(query).all()
+
+@router.put("/reorder-points", response_model=schemas.ReorderPoint)
+def set_reorder_point(reorder: schemas.ReorderPointSet, db: Session = Depends(get_db)):
+    """Create or change a reorder point; its alert is re-evaluated on commit."""
+    try:
+        if db.get(models.Product, reorder.product_id) is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        if db.get(models.Warehouse, reorder.warehouse_id) is None:
+            raise HTTPException(status_code=404, detail="Warehouse not found")
+
+        point = db.get(models.ReorderPoint, (reorder.product_id, reorder.warehouse_id))
+        if point is None:
+            point = models.ReorderPoint(**reorder.dict())
+            db.add(point)
+        else:
+            point.reorder_point = reorder.reorder_point
+        stock.mark_touched(db, [(reorder.product_id, reorder.warehouse_id)])
+        db.commit()
+        return point
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/reorder-points/{product_id}/{warehouse_id}")
+def delete_reorder_point(product_id: int, warehouse_id: int, db: Session = Depends(get_db)):
+    """Remove a reorder point and close its alert."""
+    point = db.get(models.ReorderPoint, (product_id, warehouse_id))
+    if point is None:
+        raise HTTPException(status_code=404, detail="Reorder point not found")
+    db.delete(point)
+    stock.mark_touched(db, [(product_id, warehouse_id)])
+    db.commit()
+    return {"success": True}
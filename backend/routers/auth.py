@@ -1,10 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+import asyncio
 import secrets
+import time
 import smtplib
 import os
 import sys
@@ -15,7 +21,9 @@ from dotenv import load_dotenv
 load_dotenv()
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from database import get_db
+from cache import TTLCache
+import metrics
+from database import get_async_db
 from models import User
 from schemas import UserCreate, UserLogin, Token, ForgotPassword, ResetPassword
 
@@ -26,15 +34,63 @@ SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Authenticated-user cache: decoded token -> principal, bounded and short-lived
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "60"))
+# Build the principal from signed token claims (role, full_name) without a user lookup
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() == "true"
+
+# Password hashing - bcrypt cost and the pool that runs it off the event loop
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+# min/max rounds equal to the default make needs_update() flag hashes made with another cost
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# bcrypt releases the GIL, so a small thread pool hashes in parallel
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_hash_pending = 0
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def _run_password_hash(func, *args):
+    """
+    Run a bcrypt call in the hash pool. Beyond PASSWORD_HASH_MAX_PENDING queued
+    or running calls, reject with 503 instead of letting latency grow unbounded.
+    """
+    global _hash_pending
+    if _hash_pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, please retry",
+            headers={"Retry-After": "1"},
+        )
+    _hash_pending += 1
+    started = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, partial(func, *args))
+    finally:
+        _hash_pending -= 1
+        metrics.PASSWORD_HASH_SECONDS.observe(time.perf_counter() - started)
+
+async def verify_password_async(plain_password, hashed_password):
+    return await _run_password_hash(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await _run_password_hash(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -96,12 +152,54 @@ StockMaster Team
         # Fallback to console in case of email failure
         print(f"[FALLBACK] OTP for {to_email}: {otp}")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_user_by_email(db, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """The authenticated user as seen by request handlers."""
+    id: int
+    email: str
+    full_name: str
+    role: str
+
+_principal_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+# email -> unix time (sub-second) of the last password reset / role change in
+# this process; kept only as long as a token issued before it can still be valid.
+# Only trusted-claims tokens depend on it: user lookups compare against
+# users.credentials_changed_at, which every worker sees.
+_credentials_changed_at = {}
+
+def invalidate_user(email: str, now: float = None):
+    """
+    Forget cached principals for a user and reject trusted-claims tokens issued
+    before `now` in this process. Call whenever a password or role changes.
+    """
+    _principal_cache.pop_matching(lambda principal: principal.email == email)
+    now = now or time.time()
+    expired = now - ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    for other in [key for key, changed_at in _credentials_changed_at.items() if changed_at < expired]:
+        del _credentials_changed_at[other]
+    _credentials_changed_at[email] = now
+
+def _token_claims(user: User) -> dict:
+    # Fractional iat, so a token issued in the same second as a reset is told apart
+    claims = {"sub": user.email, "iat": time.time()}
+    if AUTH_TRUST_TOKEN_CLAIMS:
+        claims.update(uid=user.id, role=user.role, name=user.full_name)
+    return claims
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    principal = _principal_cache.get(token)
+    if principal is not None:
+        return principal
+    
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -110,15 +208,33 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
+    issued_at = payload.get("iat", 0)
+    if issued_at < _credentials_changed_at.get(email, 0):
         raise credentials_exception
-    return user
+    
+    if AUTH_TRUST_TOKEN_CLAIMS and "role" in payload:
+        principal = UserPrincipal(
+            id=payload.get("uid"),
+            email=email,
+            full_name=payload.get("name"),
+            role=payload["role"],
+        )
+    else:
+        user = await get_user_by_email(db, email)
+        if user is None or issued_at < (user.credentials_changed_at or 0):
+            raise credentials_exception
+        principal = UserPrincipal(id=user.id, email=user.email, full_name=user.full_name, role=user.role)
+    
+    # Never cache a principal past the token's own expiry
+    ttl = payload.get("exp", 0) - time.time()
+    if ttl > 0:
+        _principal_cache.set(token, principal, ttl=ttl)
+    return principal
 
 @router.post("/signup", status_code=status.HTTP_201_CREATED)
-async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
+async def signup(user_data: UserCreate, db=Depends(get_async_db)):
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await get_user_by_email(db, user_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -126,7 +242,7 @@ async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     new_user = User(
         email=user_data.email,
         full_name=user_data.full_name,
@@ -135,8 +251,8 @@ async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     
     return {
         "message": "User created successfully",
@@ -145,18 +261,23 @@ async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
     }
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_async_db)):
+    user = await get_user_by_email(db, form_data.username)
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Rehash transparently when BCRYPT_ROUNDS changed since the hash was made
+    if pwd_context.needs_update(user.hashed_password):
+        user.hashed_password = await get_password_hash_async(form_data.password)
+        await db.commit()
+    
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=_token_claims(user), expires_delta=access_token_expires
     )
     
     return {
@@ -170,8 +291,8 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     }
 
 @router.post("/forgot-password")
-async def forgot_password(request: ForgotPassword, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == request.email).first()
+async def forgot_password(request: ForgotPassword, db=Depends(get_async_db)):
+    user = await get_user_by_email(db, request.email)
     if not user:
         # Don't reveal if email exists or not
         return {"message": "If the email exists, an OTP has been sent"}
@@ -181,16 +302,16 @@ async def forgot_password(request: ForgotPassword, db: Session = Depends(get_db)
     user.reset_otp = otp
     user.otp_expires_at = datetime.utcnow() + timedelta(minutes=10)
     
-    db.commit()
+    await db.commit()
     
-    # Send OTP via email
-    send_otp_email(user.email, otp)
+    # Send OTP via email (blocking SMTP, keep it off the event loop)
+    await run_in_threadpool(send_otp_email, user.email, otp)
     
     return {"message": "If the email exists, an OTP has been sent"}
 
 @router.post("/reset-password")
-async def reset_password(request: ResetPassword, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == request.email).first()
+async def reset_password(request: ResetPassword, db=Depends(get_async_db)):
+    user = await get_user_by_email(db, request.email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -211,16 +332,18 @@ async def reset_password(request: ResetPassword, db: Session = Depends(get_db)):
         )
     
     # Reset password
-    user.hashed_password = get_password_hash(request.new_password)
+    user.hashed_password = await get_password_hash_async(request.new_password)
     user.reset_otp = None
     user.otp_expires_at = None
+    changed_at = user.credentials_changed_at = time.time()
     
-    db.commit()
+    await db.commit()
+    invalidate_user(user.email, changed_at)
     
     return {"message": "Password reset successfully"}
 
 @router.get("/me")
-async def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: UserPrincipal = Depends(get_current_user)):
     return {
         "email": current_user.email,
         "full_name": current_user.full_name,
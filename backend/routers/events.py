@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+import asyncio
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pubsub
+
+router = APIRouter(
+    prefix="/events",
+    tags=["events"],
+)
+
+HEARTBEAT_SECONDS = 15
+
+
+@router.get("/stream")
+async def stream_events(request: Request):
+    """
+    Server-Sent Events stream of inventory deltas and new/updated transactions.
+    Event types: inventory, transaction, and resync when the client fell too
+    far behind and should reload its lists.
+    """
+    hub = pubsub.get_hub()
+    subscription = hub.subscribe()
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    while not subscription.queue.empty():
+                        subscription.queue.get_nowait()
+                    yield "event: resync\ndata: {}\n\n"
+                    continue
+                try:
+                    event, data = await asyncio.wait_for(subscription.queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {data}\n\n"
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
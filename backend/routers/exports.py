@@ -0,0 +1,183 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from datetime import date, datetime, time, timedelta
+from typing import Literal, Optional
+import csv
+import io
+import json
+import zlib
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import models
+from database import SessionLocal
+
+router = APIRouter(
+    prefix="/exports",
+    tags=["exports"],
+)
+
+# Rows fetched per round trip and written per chunk of the response body
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "2000"))
+
+ExportFormat = Literal["csv", "ndjson"]
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _format_chunk(rows, columns, fmt: str) -> str:
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps({name: _encode_value(value) for name, value in zip(columns, row)}) + "\n"
+            for row in rows
+        )
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_encode_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+def _stream_rows(queries, fmt: str, compress: bool):
+    """
+    Yield the formatted rows of each query in turn, in constant memory.
+    The generator owns its session: the request's session is closed before
+    the body is sent. stream_results uses a server-side cursor on PostgreSQL.
+    All queries must select the same columns.
+    """
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+
+    def encode(text: str) -> bytes:
+        data = text.encode()
+        return compressor.compress(data) if compressor else data
+
+    columns = list(queries[0].selected_columns.keys())
+    db = SessionLocal()
+    try:
+        if fmt == "csv":
+            yield encode(_format_chunk([columns], columns, fmt))
+        for query in queries:
+            result = db.execute(query.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_ROWS))
+            for rows in result.partitions():
+                data = encode(_format_chunk(rows, columns, fmt))
+                if data:
+                    yield data
+        if compressor:
+            yield compressor.flush()
+    finally:
+        db.close()
+
+
+def _export_response(queries, name: str, fmt: str, compress: bool) -> StreamingResponse:
+    filename = f"{name}-{datetime.utcnow():%Y%m%dT%H%M%S}.{fmt}"
+    media_type = MEDIA_TYPES[fmt]
+    if compress:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        _stream_rows(queries, fmt, compress),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/inventory")
+def export_inventory(
+    format: ExportFormat = "csv",
+    warehouse_id: Optional[int] = None,
+    gzip: bool = False,
+):
+    """Every inventory row with product, warehouse and reorder point."""
+    query = (
+        select(
+            models.Inventory.product_id,
+            models.Product.sku,
+            models.Product.name.label("product_name"),
+            models.Product.category,
+            models.Inventory.warehouse_id,
+            models.Warehouse.name.label("warehouse_name"),
+            func.coalesce(models.Inventory.quantity, 0).label("quantity"),
+            models.ReorderPoint.reorder_point,
+        )
+        .join(models.Product, models.Product.id == models.Inventory.product_id)
+        .join(models.Warehouse, models.Warehouse.id == models.Inventory.warehouse_id)
+        .outerjoin(
+            models.ReorderPoint,
+            (models.ReorderPoint.product_id == models.Inventory.product_id)
+            & (models.ReorderPoint.warehouse_id == models.Inventory.warehouse_id),
+        )
+        .order_by(models.Inventory.product_id, models.Inventory.warehouse_id)
+    )
+    if warehouse_id is not None:
+        query = query.where(models.Inventory.warehouse_id == warehouse_id)
+    return _export_response([query], "inventory", format, gzip)
+
+
+def _transactions_query(table, start, end, warehouse_id, transaction_type, order_by):
+    query = (
+        select(
+            table.id,
+            table.timestamp,
+            table.applied_at,
+            table.transaction_type,
+            table.status,
+            table.product_id,
+            models.Product.sku,
+            models.Product.name.label("product_name"),
+            table.warehouse_id,
+            models.Warehouse.name.label("warehouse_name"),
+            table.quantity,
+            table.reference,
+            table.notes,
+        )
+        .join(models.Product, models.Product.id == table.product_id)
+        .outerjoin(models.Warehouse, models.Warehouse.id == table.warehouse_id)
+        .order_by(*order_by)
+    )
+    if start is not None:
+        query = query.where(table.timestamp >= datetime.combine(start, time.min))
+    if end is not None:
+        query = query.where(table.timestamp < datetime.combine(end + timedelta(days=1), time.min))
+    if warehouse_id is not None:
+        query = query.where(table.warehouse_id == warehouse_id)
+    if transaction_type == "transfer":
+        query = query.where(table.transaction_type.in_(("transfer_in", "transfer_out")))
+    elif transaction_type:
+        query = query.where(table.transaction_type == transaction_type)
+    return query
+
+
+@router.get("/transactions")
+def export_transactions(
+    format: ExportFormat = "csv",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    warehouse_id: Optional[int] = None,
+    transaction_type: Optional[str] = None,
+    include_archive: bool = False,
+    gzip: bool = False,
+):
+    """
+    The transaction ledger, oldest first, for start..end (inclusive UTC days).
+    include_archive streams archived rows first, then the hot table.
+    transaction_type=transfer matches both transfer legs.
+    """
+    if start and end and end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+
+    queries = []
+    if include_archive:
+        archive = models.TransactionArchive
+        queries.append(_transactions_query(
+            archive, start, end, warehouse_id, transaction_type, (archive.period, archive.id)
+        ))
+    hot = models.Transaction
+    queries.append(_transactions_query(
+        hot, start, end, warehouse_id, transaction_type, (hot.timestamp, hot.id)
+    ))
+    return _export_response(queries, "transactions", format, gzip)
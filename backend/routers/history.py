@@ -0,0 +1,90 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+from typing import List, Optional
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import models, schemas, ledger
+from database import get_db
+
+router = APIRouter(
+    prefix="/history",
+    tags=["history"],
+)
+
+def _naive_utc(value: datetime) -> datetime:
+    """Timestamps are stored as naive UTC; normalise offset-aware query values."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+@router.post("/snapshots", response_model=schemas.StockSnapshot)
+def create_snapshot(db: Session = Depends(get_db)):
+    """Checkpoint current stock per (product, warehouse)."""
+    try:
+        snapshot = ledger.take_snapshot(db)
+        db.commit()
+        return snapshot
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/snapshots", response_model=List[schemas.StockSnapshot])
+def read_snapshots(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    return db.scalars(
+        select(models.StockSnapshot)
+        .order_by(models.StockSnapshot.taken_at.desc())
+        .offset(skip)
+        .limit(limit)
+    ).all()
+
+@router.get("/stock", response_model=schemas.StockAsOfResponse)
+def read_stock_as_of(
+    at: datetime,
+    product_id: Optional[int] = None,
+    warehouse_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """Stock per (product, warehouse) as it was at `at` (UTC)."""
+    at = _naive_utc(at)
+    snapshot, rows = ledger.stock_as_of(db, at, product_id=product_id, warehouse_id=warehouse_id)
+    return {
+        "at": at,
+        "snapshot_id": snapshot.id if snapshot else None,
+        "items": [
+            {"product_id": row.product_id, "warehouse_id": row.warehouse_id, "quantity": row.quantity}
+            for row in rows
+        ],
+    }
+
+@router.post("/archive", response_model=schemas.ArchiveResult)
+def archive_transactions(before: datetime, db: Session = Depends(get_db)):
+    """Move settled transactions applied before `before` out of the hot table."""
+    try:
+        return {"archived": ledger.archive_transactions(db, _naive_utc(before))}
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/archive/periods", response_model=List[schemas.ArchivePeriod])
+def read_archive_periods(db: Session = Depends(get_db)):
+    return [{"period": row.period, "transactions": row.transactions} for row in ledger.archive_periods(db)]
+
+@router.get("/archive", response_model=List[schemas.ArchivedTransaction])
+def read_archived_transactions(
+    period: str,
+    after_id: Optional[int] = None,
+    limit: int = 100,
+    product_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """Archived transactions of one period (YYYY-MM), paged by id."""
+    archive = models.TransactionArchive
+    query = select(archive).where(archive.period == period)
+    if after_id is not None:
+        query = query.where(archive.id > after_id)
+    if product_id is not None:
+        query = query.where(archive.product_id == product_id)
+    return db.scalars(query.order_by(archive.id).limit(min(limit, 1000))).all()
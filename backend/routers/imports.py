@@ -0,0 +1,76 @@
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import List, Literal, Optional
+import io
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import models, schemas, importer
+from database import get_db
+
+router = APIRouter(
+    prefix="/imports",
+    tags=["imports"],
+)
+
+# Rejected rows returned inline with the job; the rest are paged from /imports/{id}/errors
+INLINE_ERRORS = 100
+
+def _job_result(db: Session, job: models.ImportJob) -> dict:
+    errors = db.scalars(
+        select(models.ImportJobError)
+        .where(models.ImportJobError.job_id == job.id)
+        .order_by(models.ImportJobError.row_number)
+        .limit(INLINE_ERRORS)
+    ).all()
+    return {**schemas.ImportJob.model_validate(job).model_dump(), "errors": errors}
+
+@router.post("/products", response_model=schemas.ImportJobResult)
+def import_products(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = None,
+    update_existing: bool = False,
+    job_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Import products, stock and reorder points from a CSV or NDJSON upload
+    (format defaults from the file name). To resume a failed import, upload
+    the same file again with its job_id.
+    """
+    if job_id is not None:
+        job = db.get(models.ImportJob, job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Import job not found")
+    else:
+        job = importer.create_job(
+            db, format or importer.detect_format(file.filename), source=file.filename, update_existing=update_existing
+        )
+
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        importer.run_import(db, stream, job)
+    except Exception:
+        # The job row records the failure and the resume checkpoint
+        pass
+    finally:
+        stream.detach()
+    return _job_result(db, job)
+
+@router.get("/{job_id}", response_model=schemas.ImportJobResult)
+def read_import_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.get(models.ImportJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return _job_result(db, job)
+
+@router.get("/{job_id}/errors", response_model=List[schemas.ImportRowError])
+def read_import_errors(job_id: int, after_row: int = 0, limit: int = 500, db: Session = Depends(get_db)):
+    """Rejected rows of a job in file order, paged by row number."""
+    return db.scalars(
+        select(models.ImportJobError)
+        .where(models.ImportJobError.job_id == job_id, models.ImportJobError.row_number > after_row)
+        .order_by(models.ImportJobError.row_number)
+        .limit(min(limit, 5000))
+    ).all()
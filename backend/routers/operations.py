@@ -1,26 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select, union_all, literal, func, or_, and_, tuple_
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import datetime
+from collections import defaultdict
+from pydantic import TypeAdapter
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-import models, schemas
-from database import get_db
+import models, schemas, stock, pubsub, versioning, idempotency, ingest
+from database import SessionLocal, get_db, get_read_db
 
 router = APIRouter(
     prefix="/operations",
     tags=["operations"],
 )
 
+def _transaction_event(transaction, product_name: str, warehouse_name: str) -> dict:
+    """A flushed transaction shaped like schemas.TransactionHistory, for live subscribers."""
+    return {
+        "id": transaction.id,
+        "product_name": product_name,
+        "warehouse_name": warehouse_name,
+        "transaction_type": transaction.transaction_type,
+        "quantity": transaction.quantity,
+        "reference": transaction.reference,
+        "notes": transaction.notes,
+        "status": transaction.status,
+        "timestamp": transaction.timestamp.isoformat(),
+    }
+
+def _stock_event(product_id: int, warehouse_id: int, quantity: float, delta: float) -> dict:
+    return {"product_id": product_id, "warehouse_id": warehouse_id, "quantity": quantity, "delta": delta}
+
+def _publish(transactions: list, inventory: list):
+    """Push committed changes to /events/stream subscribers."""
+    pubsub.publish_inventory(inventory)
+    pubsub.publish_transactions(transactions)
+
 # RECEIPT OPERATIONS - Incoming goods from suppliers
 @router.post("/receipts/", response_model=schemas.OperationResponse)
-def create_receipt(receipt: schemas.ReceiptCreate, db: Session = Depends(get_db)):
+def create_receipt(
+    receipt: schemas.ReceiptCreate,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Depends(idempotency.key_header),
+):
     """
     Create a receipt operation (incoming goods).
     Increases inventory only when status is COMPLETED.
     """
     try:
+        replay = idempotency.begin(db, idempotency_key, "receipts", receipt)
+        if replay:
+            return replay
+        
         # Validate product exists
         product = db.query(models.Product).filter(models.Product.id == receipt.product_id).first()
         if not product:
@@ -34,23 +67,7 @@ def create_receipt(receipt: schemas.ReceiptCreate, db: Session = Depends(get_db)
         # Only update inventory if status is COMPLETED
         current_quantity = 0
         if receipt.status == "COMPLETED":
-            # Update or create inventory record
-            inventory = db.query(models.Inventory).filter(
-                models.Inventory.product_id == receipt.product_id,
-                models.Inventory.warehouse_id == receipt.warehouse_id
-            ).first()
-            
-            if inventory:
-                inventory.quantity += receipt.quantity
-                current_quantity = inventory.quantity
-            else:
-                inventory = models.Inventory(
-                    product_id=receipt.product_id,
-                    warehouse_id=receipt.warehouse_id,
-                    quantity=receipt.quantity
-                )
-                db.add(inventory)
-                current_quantity = receipt.quantity
+            current_quantity = stock.add_stock(db, receipt.product_id, receipt.warehouse_id, receipt.quantity)
         
         # Create transaction record
         transaction = models.Transaction(
@@ -64,20 +81,32 @@ def create_receipt(receipt: schemas.ReceiptCreate, db: Session = Depends(get_db)
             timestamp=datetime.utcnow()
         )
         db.add(transaction)
-        
-        db.commit()
-        db.refresh(transaction)
+        db.flush()
+        event = _transaction_event(transaction, product.name, warehouse.name)
         
         status_msg = f"Receipt created with status: {receipt.status}"
         if receipt.status == "COMPLETED":
             status_msg += f". Inventory increased by {receipt.quantity} {product.unit_of_measure}"
         
-        return {
+        result = {
             "success": True,
             "message": status_msg,
             "transaction_id": transaction.id,
             "new_quantity": current_quantity
         }
+        idempotency.record(db, schemas.OperationResponse, result)
+        
+        db.commit()
+        
+        changes = []
+        if receipt.status == "COMPLETED":
+            changes.append(_stock_event(receipt.product_id, receipt.warehouse_id, current_quantity, receipt.quantity))
+        _publish([event], changes)
+        
+        return result
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
@@ -85,12 +114,20 @@ def create_receipt(receipt: schemas.ReceiptCreate, db: Session = Depends(get_db)
 
 # DELIVERY OPERATIONS - Outgoing goods to customers
 @router.post("/deliveries/", response_model=schemas.OperationResponse)
-def create_delivery(delivery: schemas.DeliveryCreate, db: Session = Depends(get_db)):
+def create_delivery(
+    delivery: schemas.DeliveryCreate,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Depends(idempotency.key_header),
+):
     """
     Create a delivery operation (outgoing goods).
     Decreases inventory only when status is SHIPPED.
     """
     try:
+        replay = idempotency.begin(db, idempotency_key, "deliveries", delivery)
+        if replay:
+            return replay
+        
         # Validate product exists
         product = db.query(models.Product).filter(models.Product.id == delivery.product_id).first()
         if not product:
@@ -101,26 +138,16 @@ def create_delivery(delivery: schemas.DeliveryCreate, db: Session = Depends(get_
         if not warehouse:
             raise HTTPException(status_code=404, detail="Warehouse not found")
         
-        # Get current inventory
-        inventory = db.query(models.Inventory).filter(
-            models.Inventory.product_id == delivery.product_id,
-            models.Inventory.warehouse_id == delivery.warehouse_id
-        ).first()
-        
-        current_quantity = inventory.quantity if inventory else 0
-        
         # Only decrease inventory if status is SHIPPED
         if delivery.status == "SHIPPED":
-            if not inventory or inventory.quantity < delivery.quantity:
-                available = inventory.quantity if inventory else 0
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Insufficient stock. Available: {available}, Requested: {delivery.quantity}"
+            try:
+                current_quantity = stock.remove_stock(
+                    db, delivery.product_id, delivery.warehouse_id, delivery.quantity
                 )
-            
-            # Decrease inventory
-            inventory.quantity -= delivery.quantity
-            current_quantity = inventory.quantity
+            except stock.InsufficientStock as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        else:
+            current_quantity = stock.get_quantity(db, delivery.product_id, delivery.warehouse_id)
         
         # Create transaction record
         transaction = models.Transaction(
@@ -134,20 +161,29 @@ def create_delivery(delivery: schemas.DeliveryCreate, db: Session = Depends(get_
             timestamp=datetime.utcnow()
         )
         db.add(transaction)
-        
-        db.commit()
-        db.refresh(transaction)
+        db.flush()
+        event = _transaction_event(transaction, product.name, warehouse.name)
         
         status_msg = f"Delivery created with status: {delivery.status}"
         if delivery.status == "SHIPPED":
             status_msg += f". Inventory decreased by {delivery.quantity} {product.unit_of_measure}"
         
-        return {
+        result = {
             "success": True,
             "message": status_msg,
             "transaction_id": transaction.id,
             "new_quantity": current_quantity
         }
+        idempotency.record(db, schemas.OperationResponse, result)
+        
+        db.commit()
+        
+        changes = []
+        if delivery.status == "SHIPPED":
+            changes.append(_stock_event(delivery.product_id, delivery.warehouse_id, current_quantity, -delivery.quantity))
+        _publish([event], changes)
+        
+        return result
     except HTTPException:
         db.rollback()
         raise
@@ -158,12 +194,20 @@ def create_delivery(delivery: schemas.DeliveryCreate, db: Session = Depends(get_
 
 # TRANSFER OPERATIONS - Internal movement between warehouses
 @router.post("/transfers/", response_model=schemas.OperationResponse)
-def create_transfer(transfer: schemas.TransferCreate, db: Session = Depends(get_db)):
+def create_transfer(
+    transfer: schemas.TransferCreate,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Depends(idempotency.key_header),
+):
     """
     Create a transfer operation (internal movement).
     Moves stock between warehouses.
     """
     try:
+        replay = idempotency.begin(db, idempotency_key, "transfers", transfer)
+        if replay:
+            return replay
+        
         if transfer.from_warehouse_id == transfer.to_warehouse_id:
             raise HTTPException(status_code=400, detail="Cannot transfer to the same warehouse")
         
@@ -179,37 +223,20 @@ def create_transfer(transfer: schemas.TransferCreate, db: Session = Depends(get_
         if not from_warehouse or not to_warehouse:
             raise HTTPException(status_code=404, detail="Warehouse not found")
         
-        # Check source inventory
-        from_inventory = db.query(models.Inventory).filter(
-            models.Inventory.product_id == transfer.product_id,
-            models.Inventory.warehouse_id == transfer.from_warehouse_id
-        ).first()
-        
-        if not from_inventory or from_inventory.quantity < transfer.quantity:
-            available = from_inventory.quantity if from_inventory else 0
+        # Decrease from source and increase at destination, touching the rows in
+        # warehouse id order so opposite transfers cannot deadlock
+        try:
+            if transfer.from_warehouse_id < transfer.to_warehouse_id:
+                from_quantity = stock.remove_stock(db, transfer.product_id, transfer.from_warehouse_id, transfer.quantity)
+                to_quantity = stock.add_stock(db, transfer.product_id, transfer.to_warehouse_id, transfer.quantity)
+            else:
+                to_quantity = stock.add_stock(db, transfer.product_id, transfer.to_warehouse_id, transfer.quantity)
+                from_quantity = stock.remove_stock(db, transfer.product_id, transfer.from_warehouse_id, transfer.quantity)
+        except stock.InsufficientStock as e:
             raise HTTPException(
                 status_code=400,
-                detail=f"Insufficient stock in source warehouse. Available: {available}, Requested: {transfer.quantity}"
-            )
-        
-        # Decrease from source
-        from_inventory.quantity -= transfer.quantity
-        
-        # Increase at destination
-        to_inventory = db.query(models.Inventory).filter(
-            models.Inventory.product_id == transfer.product_id,
-            models.Inventory.warehouse_id == transfer.to_warehouse_id
-        ).first()
-        
-        if to_inventory:
-            to_inventory.quantity += transfer.quantity
-        else:
-            to_inventory = models.Inventory(
-                product_id=transfer.product_id,
-                warehouse_id=transfer.to_warehouse_id,
-                quantity=transfer.quantity
+                detail=f"Insufficient stock in source warehouse. Available: {e.available}, Requested: {transfer.quantity}"
             )
-            db.add(to_inventory)
         
         # Create transaction records (one for each warehouse)
         transaction_out = models.Transaction(
@@ -236,15 +263,28 @@ def create_transfer(transfer: schemas.TransferCreate, db: Session = Depends(get_
         
         db.add(transaction_out)
         db.add(transaction_in)
+        db.flush()
+        events = [
+            _transaction_event(transaction_out, product.name, from_warehouse.name),
+            _transaction_event(transaction_in, product.name, to_warehouse.name),
+        ]
         
-        db.commit()
-        
-        return {
+        result = {
             "success": True,
             "message": f"Transfer created: {transfer.quantity} {product.unit_of_measure} from {from_warehouse.name} to {to_warehouse.name}",
             "transaction_id": transaction_in.id,
-            "new_quantity": to_inventory.quantity
+            "new_quantity": to_quantity
         }
+        idempotency.record(db, schemas.OperationResponse, result)
+        
+        db.commit()
+        
+        _publish(events, [
+            _stock_event(transfer.product_id, transfer.from_warehouse_id, from_quantity, -transfer.quantity),
+            _stock_event(transfer.product_id, transfer.to_warehouse_id, to_quantity, transfer.quantity),
+        ])
+        
+        return result
     except HTTPException:
         db.rollback()
         raise
@@ -255,12 +295,20 @@ def create_transfer(transfer: schemas.TransferCreate, db: Session = Depends(get_
 
 # ADJUSTMENT OPERATIONS - Fix mismatches between recorded and physical count
 @router.post("/adjustments/", response_model=schemas.OperationResponse)
-def create_adjustment(adjustment: schemas.AdjustmentCreate, db: Session = Depends(get_db)):
+def create_adjustment(
+    adjustment: schemas.AdjustmentCreate,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Depends(idempotency.key_header),
+):
     """
     Create an adjustment operation (fix inventory discrepancies).
     Updates inventory to match physical count.
     """
     try:
+        replay = idempotency.begin(db, idempotency_key, "adjustments", adjustment)
+        if replay:
+            return replay
+        
         # Validate product exists
         product = db.query(models.Product).filter(models.Product.id == adjustment.product_id).first()
         if not product:
@@ -271,25 +319,12 @@ def create_adjustment(adjustment: schemas.AdjustmentCreate, db: Session = Depend
         if not warehouse:
             raise HTTPException(status_code=404, detail="Warehouse not found")
         
-        # Get current inventory
-        inventory = db.query(models.Inventory).filter(
-            models.Inventory.product_id == adjustment.product_id,
-            models.Inventory.warehouse_id == adjustment.warehouse_id
-        ).first()
-        
-        old_quantity = inventory.quantity if inventory else 0
+        # Set inventory to the counted quantity
+        old_quantity = stock.set_stock(
+            db, adjustment.product_id, adjustment.warehouse_id, adjustment.counted_quantity
+        )
         difference = adjustment.counted_quantity - old_quantity
         
-        if inventory:
-            inventory.quantity = adjustment.counted_quantity
-        else:
-            inventory = models.Inventory(
-                product_id=adjustment.product_id,
-                warehouse_id=adjustment.warehouse_id,
-                quantity=adjustment.counted_quantity
-            )
-            db.add(inventory)
-        
         # Create transaction record
         transaction = models.Transaction(
             product_id=adjustment.product_id,
@@ -302,45 +337,529 @@ def create_adjustment(adjustment: schemas.AdjustmentCreate, db: Session = Depend
             timestamp=datetime.utcnow()
         )
         db.add(transaction)
+        db.flush()
+        event = _transaction_event(transaction, product.name, warehouse.name)
         
-        db.commit()
-        db.refresh(transaction)
-        
-        return {
+        result = {
             "success": True,
             "message": f"Adjustment created: {'+' if difference >= 0 else ''}{difference} {product.unit_of_measure} ({old_quantity} → {adjustment.counted_quantity})",
             "transaction_id": transaction.id,
             "new_quantity": adjustment.counted_quantity
         }
+        idempotency.record(db, schemas.OperationResponse, result)
+        
+        db.commit()
+        
+        _publish([event], [
+            _stock_event(adjustment.product_id, adjustment.warehouse_id, adjustment.counted_quantity, difference),
+        ])
+        
+        return result
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# BULK OPERATIONS - Many receipts/deliveries/transfers/adjustments in one request
+
+# Best-effort batches that lose a decrement race are planned again this many times
+BULK_REPLAN_ATTEMPTS = 3
+
+
+class BulkItemError(Exception):
+    """Raised when a single item of a bulk request cannot be applied."""
+
+
+def _load_references(db: Session, product_ids: set, warehouse_ids: set):
+    """Fetch every referenced product and warehouse with one UNION query."""
+    rows = db.execute(union_all(
+        select(
+            literal("product").label("kind"),
+            models.Product.id.label("id"),
+            models.Product.name.label("name"),
+            models.Product.unit_of_measure.label("unit"),
+        ).where(models.Product.id.in_(product_ids)),
+        select(
+            literal("warehouse"),
+            models.Warehouse.id,
+            models.Warehouse.name,
+            literal(None),
+        ).where(models.Warehouse.id.in_(warehouse_ids)),
+    )).all()
+
+    products = {row.id: row for row in rows if row.kind == "product"}
+    warehouses = {row.id: row.name for row in rows if row.kind == "warehouse"}
+    return products, warehouses
+
+
+def _load_stock(db: Session, product_ids: set, warehouse_ids: set, lock_keys=()):
+    """
+    Current quantity per (product_id, warehouse_id) for the referenced rows.
+    Rows in lock_keys are first locked FOR UPDATE, in key order, so
+    quantities planned from them stay exact until the commit.
+    """
+    if lock_keys:
+        db.execute(
+            select(models.Inventory.id)
+            .where(tuple_(models.Inventory.product_id, models.Inventory.warehouse_id).in_(sorted(lock_keys)))
+            .order_by(models.Inventory.product_id, models.Inventory.warehouse_id)
+            .with_for_update()
+        ).all()
+    rows = db.execute(
+        select(
+            models.Inventory.product_id,
+            models.Inventory.warehouse_id,
+            models.Inventory.quantity,
+        ).where(
+            models.Inventory.product_id.in_(product_ids),
+            models.Inventory.warehouse_id.in_(warehouse_ids),
+        )
+    ).all()
+    return {(row.product_id, row.warehouse_id): row.quantity or 0 for row in rows}
+
+
+def _plan_bulk_item(op, products: dict, warehouses: dict, ledger: dict):
+    """
+    Validate one bulk item against the in-memory stock ledger.
+    Returns (deltas, transactions, message, new_quantity) without touching the database.
+    """
+    if op.product_id not in products:
+        raise BulkItemError("Product not found")
+    unit = products[op.product_id].unit
+
+    if op.type == "transfer":
+        if op.from_warehouse_id == op.to_warehouse_id:
+            raise BulkItemError("Cannot transfer to the same warehouse")
+        if op.from_warehouse_id not in warehouses or op.to_warehouse_id not in warehouses:
+            raise BulkItemError("Warehouse not found")
+
+        from_key = (op.product_id, op.from_warehouse_id)
+        to_key = (op.product_id, op.to_warehouse_id)
+        available = ledger.get(from_key, 0)
+        if available < op.quantity:
+            raise BulkItemError(
+                f"Insufficient stock in source warehouse. Available: {available}, Requested: {op.quantity}"
+            )
+
+        from_name = warehouses[op.from_warehouse_id]
+        to_name = warehouses[op.to_warehouse_id]
+        transactions = [
+            dict(
+                product_id=op.product_id,
+                warehouse_id=op.from_warehouse_id,
+                transaction_type="transfer_out",
+                quantity=-op.quantity,
+                reference=f"Transfer to {to_name}",
+                notes=op.notes,
+                status="DONE",
+            ),
+            dict(
+                product_id=op.product_id,
+                warehouse_id=op.to_warehouse_id,
+                transaction_type="transfer_in",
+                quantity=op.quantity,
+                reference=f"Transfer from {from_name}",
+                notes=op.notes,
+                status="DONE",
+            ),
+        ]
+        deltas = [(from_key, -op.quantity), (to_key, op.quantity)]
+        message = f"Transfer created: {op.quantity} {unit} from {from_name} to {to_name}"
+        return deltas, transactions, message, ledger.get(to_key, 0) + op.quantity
+
+    if op.warehouse_id not in warehouses:
+        raise BulkItemError("Warehouse not found")
+    key = (op.product_id, op.warehouse_id)
+    current_quantity = ledger.get(key, 0)
+
+    if op.type == "receipt":
+        deltas = [(key, op.quantity)] if op.status == "COMPLETED" else []
+        transaction = dict(
+            transaction_type="receipt",
+            quantity=op.quantity,
+            reference=f"Receipt from {op.supplier_name}",
+            notes=op.notes,
+            status=op.status,
+        )
+        message = f"Receipt created with status: {op.status}"
+        if op.status == "COMPLETED":
+            message += f". Inventory increased by {op.quantity} {unit}"
+
+    elif op.type == "delivery":
+        deltas = []
+        if op.status == "SHIPPED":
+            if current_quantity < op.quantity:
+                raise BulkItemError(
+                    f"Insufficient stock. Available: {current_quantity}, Requested: {op.quantity}"
+                )
+            deltas = [(key, -op.quantity)]
+        transaction = dict(
+            transaction_type="delivery",
+            quantity=-op.quantity,
+            reference=f"Delivery to {op.customer_name}",
+            notes=op.notes,
+            status=op.status,
+        )
+        message = f"Delivery created with status: {op.status}"
+        if op.status == "SHIPPED":
+            message += f". Inventory decreased by {op.quantity} {unit}"
+
+    else:  # adjustment
+        difference = op.counted_quantity - current_quantity
+        deltas = [(key, difference)]
+        transaction = dict(
+            transaction_type="adjustment",
+            quantity=difference,
+            reference=f"Stock adjustment: {op.reason}",
+            notes=f"Old: {current_quantity}, New: {op.counted_quantity}. {op.notes or ''}",
+            status="DONE",
+        )
+        message = (
+            f"Adjustment created: {'+' if difference >= 0 else ''}{difference} {unit} "
+            f"({current_quantity} → {op.counted_quantity})"
+        )
+
+    transaction.update(product_id=op.product_id, warehouse_id=op.warehouse_id)
+    new_quantity = current_quantity + sum(delta for _, delta in deltas)
+    return deltas, [transaction], message, new_quantity
+
+
+def _warehouse_ids(op) -> tuple:
+    return (op.from_warehouse_id, op.to_warehouse_id) if op.type == "transfer" else (op.warehouse_id,)
+
+
+def _referenced_ids(operations) -> tuple:
+    """(product ids, warehouse ids) referenced by a list of bulk items."""
+    product_ids = {op.product_id for op in operations}
+    warehouse_ids = {warehouse_id for op in operations for warehouse_id in _warehouse_ids(op)}
+    return product_ids, warehouse_ids
+
+
+def _plan_bulk(operations: list, products: dict, warehouses: dict, ledger: dict):
+    """
+    Plan every item against the stock ledger, which is updated in place.
+    Returns (results, planned, pending): planned holds (result, transactions)
+    for each item that can be applied, pending the net delta per row.
+    """
+    results = []
+    planned = []
+    pending = defaultdict(float)
+    for index, op in enumerate(operations):
+        try:
+            deltas, transactions, message, new_quantity = _plan_bulk_item(op, products, warehouses, ledger)
+        except BulkItemError as e:
+            results.append({"index": index, "success": False, "message": str(e)})
+            continue
+
+        for key, delta in deltas:
+            ledger[key] = ledger.get(key, 0) + delta
+            pending[key] += delta
+        result = {
+            "index": index,
+            "success": True,
+            "message": message,
+            "new_quantity": new_quantity,
+        }
+        results.append(result)
+        planned.append((result, transactions))
+    return results, planned, pending
+
+
+def _remove_pending(db: Session, pending: dict):
+    """
+    Apply the negative deltas, in key order. Decrements are conditional, so
+    stock that moved since it was read cannot be oversold; when one fails,
+    the ones already taken are put back and InsufficientStock is raised.
+    """
+    taken = {}
+    try:
+        for (product_id, warehouse_id), delta in sorted(pending.items()):
+            if delta < 0:
+                stock.remove_stock(db, product_id, warehouse_id, -delta)
+                taken[(product_id, warehouse_id)] = -delta
+    except stock.InsufficientStock:
+        if taken:
+            stock.add_stock_many(db, taken)
+        raise
+
+
+def _apply_bulk(db: Session, operations: list, atomic: bool):
+    """
+    Plan and write a batch of bulk items in the current transaction.
+    Returns (results, failed, events, stock_changes); the caller commits and
+    publishes. With atomic=True and a failing item nothing is written.
+    When stock moves while the batch is applied, atomic batches raise
+    HTTPException(409); best-effort batches are planned again from fresh
+    stock, so only the items that no longer fit fail.
+    """
+    product_ids, warehouse_ids = _referenced_ids(operations)
+    products, warehouses = _load_references(db, product_ids, warehouse_ids)
+    # Adjustments set stock to a counted quantity, so their rows must not
+    # move between this read and the write
+    adjusted = {(op.product_id, op.warehouse_id) for op in operations if op.type == "adjustment"}
+
+    for attempt in range(BULK_REPLAN_ATTEMPTS):
+        ledger = _load_stock(db, product_ids, warehouse_ids, lock_keys=adjusted)
+        results, planned, pending = _plan_bulk(operations, products, warehouses, ledger)
+
+        failed = len(operations) - len(planned)
+        if failed and atomic:
+            for result in results:
+                if result["success"]:
+                    result["success"] = False
+                    result["message"] = "Not applied: batch rolled back"
+                    result["new_quantity"] = None
+            return results, failed, [], []
+
+        try:
+            _remove_pending(db, pending)
+            break
+        except stock.InsufficientStock as e:
+            if atomic or attempt == BULK_REPLAN_ATTEMPTS - 1:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Stock changed while the batch was applied, retry the request. {e}"
+                )
+    increases = {key: delta for key, delta in pending.items() if delta >= 0}
+    if increases:
+        stock.add_stock_many(db, increases)
+
+    now = datetime.utcnow()
+    batch = []
+    for result, transactions in planned:
+        rows = [models.Transaction(timestamp=now, **fields) for fields in transactions]
+        db.add_all(rows)
+        batch.append((result, rows))
+    db.flush()
+
+    events = []
+    for result, rows in batch:
+        # Transfers report the incoming leg, like create_transfer
+        result["transaction_id"] = rows[-1].id
+        events.extend(
+            _transaction_event(row, products[row.product_id].name, warehouses[row.warehouse_id])
+            for row in rows
+        )
+    # Other writers may have moved unlocked rows since the plan was made;
+    # publish the quantities this transaction actually left behind
+    changed = {key: delta for key, delta in pending.items() if delta}
+    final = _load_stock(db, {key[0] for key in changed}, {key[1] for key in changed}) if changed else {}
+    stock_changes = [
+        _stock_event(product_id, warehouse_id, final.get((product_id, warehouse_id), 0), delta)
+        for (product_id, warehouse_id), delta in changed.items()
+    ]
+    return results, failed, events, stock_changes
+
+
+@router.post("/bulk/", response_model=schemas.BulkOperationResponse)
+def create_bulk_operations(
+    bulk: schemas.BulkOperationRequest,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Depends(idempotency.key_header),
+):
+    """
+    Apply a batch of mixed operations with a single commit.
+    All referenced products/warehouses are validated with one query and
+    inventory deltas are grouped per (product, warehouse) before writing.
+    atomic=True: any failing item rolls back the whole batch.
+    atomic=False: valid items are applied, failing items are reported.
+    """
+    operations = bulk.operations
+    if not operations:
+        return {"success": True, "applied": 0, "failed": 0, "results": []}
+
+    try:
+        replay = idempotency.begin(db, idempotency_key, "bulk", bulk)
+        if replay:
+            return replay
+
+        results, failed, events, stock_changes = _apply_bulk(db, operations, bulk.atomic)
+        if failed and bulk.atomic:
+            return {"success": False, "applied": 0, "failed": failed, "results": results}
+
+        response = {
+            "success": failed == 0,
+            "applied": len(operations) - failed,
+            "failed": failed,
+            "results": results,
+        }
+        idempotency.record(db, schemas.BulkOperationResponse, response)
+
+        db.commit()
+
+        _publish(events, stock_changes)
+
+        return response
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# INGEST QUEUE - Write-behind mode for bursts (see ingest.py)
+_bulk_item = TypeAdapter(schemas.BulkOperationItem)
+
+def _require_ingest():
+    if not ingest.INGEST_QUEUE_ENABLED:
+        raise HTTPException(status_code=503, detail="Ingest queue is disabled (INGEST_QUEUE_ENABLED=false)")
+
+
+@router.post("/queue/", response_model=List[schemas.QueuedOperation], status_code=202)
+def enqueue_operations(queued: schemas.QueuedOperationsRequest, db: Session = Depends(get_db)):
+    """
+    Accept operations for write-behind application and return their queue ids
+    at once. Products and warehouses are checked now; stock is checked when
+    the batch is applied. Poll GET /operations/queue/{id} for the outcome.
+    """
+    _require_ingest()
+    operations = queued.operations
+    products, warehouses = _load_references(db, *_referenced_ids(operations))
+    for index, op in enumerate(operations):
+        if op.product_id not in products:
+            raise HTTPException(status_code=404, detail=f"Operation {index}: Product not found")
+        if any(warehouse_id not in warehouses for warehouse_id in _warehouse_ids(op)):
+            raise HTTPException(status_code=404, detail=f"Operation {index}: Warehouse not found")
+    return ingest.enqueue([op.model_dump(mode="json") for op in operations])
+
+
+@router.get("/queue/", response_model=schemas.IngestQueueStatus)
+def ingest_queue_status():
+    """Entries per status in this host's ingest queue."""
+    if not ingest.INGEST_QUEUE_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **ingest.counts()}
+
+
+@router.get("/queue/{entry_id}", response_model=schemas.QueuedOperation)
+def get_queued_operation(entry_id: str, db: Session = Depends(get_db)):
+    """State of a queued operation: queued, applying, applied or failed."""
+    _require_ingest()
+    entry = ingest.get(entry_id)
+    if entry is not None:
+        return entry
+    # Purged from the queue, or accepted by another host
+    outcome = idempotency.stored_responses(db, [ingest.result_key(entry_id)])
+    if not outcome:
+        raise HTTPException(status_code=404, detail="Queued operation not found")
+    return {"id": entry_id, **outcome[ingest.result_key(entry_id)]}
+
+
+def apply_queued(entries: list) -> dict:
+    """
+    Apply claimed ingest-queue entries ((id, payload) pairs) with one commit
+    and return their outcomes by id. Entries whose outcome is already stored
+    (a retried claim) are reported, not applied again.
+    """
+    db = SessionLocal()
+    try:
+        keys = {ingest.result_key(entry_id): entry_id for entry_id, _ in entries}
+        outcomes = {keys[key]: outcome for key, outcome in idempotency.stored_responses(db, keys).items()}
+        pending = [(entry_id, payload) for entry_id, payload in entries if entry_id not in outcomes]
+        if not pending:
+            return outcomes
+
+        operations = [_bulk_item.validate_python(payload) for _, payload in pending]
+        results, _, events, stock_changes = _apply_bulk(db, operations, atomic=False)
+
+        records = []
+        for (entry_id, payload), result in zip(pending, results):
+            outcome = {
+                "status": "applied" if result["success"] else "failed",
+                "transaction_id": result.get("transaction_id"),
+                "new_quantity": result.get("new_quantity"),
+                "message": result["message"],
+            }
+            outcomes[entry_id] = outcome
+            records.append((ingest.result_key(entry_id), payload, outcome))
+        idempotency.store_many(db, "ingest", records)
+
+        db.commit()
+
+        _publish(events, stock_changes)
+        return outcomes
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
 # GET recent operations
+def _parse_feed_cursor(cursor: str):
+    """Split a "<iso timestamp>|<id>" feed cursor into its parts."""
+    try:
+        timestamp, transaction_id = cursor.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(transaction_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/recent/", response_model=List[schemas.TransactionHistory])
-def get_recent_operations(limit: int = 50, db: Session = Depends(get_db)):
-    """Get recent operations/transactions"""
-    transactions = db.query(models.Transaction)\
-        .order_by(models.Transaction.timestamp.desc())\
-        .limit(limit)\
-        .all()
-    
-    result = []
-    for t in transactions:
-        result.append({
-            "id": t.id,
-            "product_name": t.product.name,
-            "warehouse_name": t.warehouse.name,
-            "transaction_type": t.transaction_type,
-            "quantity": t.quantity,
-            "reference": t.reference,
-            "notes": t.notes,
-            "status": t.status,
-            "timestamp": t.timestamp
-        })
-    
-    return result
+def get_recent_operations(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    transaction_type: Optional[str] = None,
+    status: Optional[str] = None,
+    warehouse_id: Optional[int] = None,
+    product_id: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+):
+    """
+    Get recent operations/transactions, newest first.
+    Rows are read as a single joined column projection (no ORM objects).
+    Pass the X-Next-Cursor header of the previous page as `cursor` to scroll
+    further back; transaction_type=transfer matches both transfer legs.
+    """
+    cached = versioning.not_modified(request, response, db, ("transactions", "products", "warehouses"))
+    if cached:
+        return cached
+
+    query = (
+        select(
+            models.Transaction.id,
+            models.Product.name.label("product_name"),
+            func.coalesce(models.Warehouse.name, "").label("warehouse_name"),
+            models.Transaction.transaction_type,
+            models.Transaction.quantity,
+            models.Transaction.reference,
+            models.Transaction.notes,
+            models.Transaction.status,
+            models.Transaction.timestamp,
+        )
+        .join(models.Product, models.Product.id == models.Transaction.product_id)
+        .outerjoin(models.Warehouse, models.Warehouse.id == models.Transaction.warehouse_id)
+        .order_by(models.Transaction.timestamp.desc(), models.Transaction.id.desc())
+    )
+
+    if transaction_type == "transfer":
+        query = query.where(models.Transaction.transaction_type.in_(("transfer_in", "transfer_out")))
+    elif transaction_type:
+        query = query.where(models.Transaction.transaction_type == transaction_type)
+    if status:
+        query = query.where(models.Transaction.status == status)
+    if warehouse_id is not None:
+        query = query.where(models.Transaction.warehouse_id == warehouse_id)
+    if product_id is not None:
+        query = query.where(models.Transaction.product_id == product_id)
+    if cursor:
+        cursor_timestamp, cursor_id = _parse_feed_cursor(cursor)
+        query = query.where(or_(
+            models.Transaction.timestamp < cursor_timestamp,
+            and_(models.Transaction.timestamp == cursor_timestamp, models.Transaction.id < cursor_id),
+        ))
+
+    rows = db.execute(query.limit(limit)).mappings().all()
+    if rows and len(rows) == limit:
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = f"{last['timestamp'].isoformat()}|{last['id']}"
+    return rows
 
 
 # UPDATE TRANSACTION STATUS
@@ -348,7 +867,8 @@ def get_recent_operations(limit: int = 50, db: Session = Depends(get_db)):
 def update_transaction_status(
     transaction_id: int, 
     status_update: schemas.StatusUpdate, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Depends(idempotency.key_header),
 ):
     """
     Update transaction status and adjust inventory accordingly.
@@ -356,6 +876,10 @@ def update_transaction_status(
     For deliveries: Only SHIPPED status removes from inventory
     """
     try:
+        replay = idempotency.begin(db, idempotency_key, f"{transaction_id}/status", status_update)
+        if replay:
+            return replay
+        
         transaction = db.query(models.Transaction).filter(models.Transaction.id == transaction_id).first()
         if not transaction:
             raise HTTPException(status_code=404, detail="Transaction not found")
@@ -363,61 +887,87 @@ def update_transaction_status(
         old_status = transaction.status
         new_status = status_update.status
         
-        # Get inventory record
-        inventory = db.query(models.Inventory).filter(
-            models.Inventory.product_id == transaction.product_id,
-            models.Inventory.warehouse_id == transaction.warehouse_id
-        ).first()
-        
-        product = transaction.product
+        product_id = transaction.product_id
+        warehouse_id = transaction.warehouse_id
+        current_quantity = None
+        delta = 0
         
         # Handle receipt status changes
         if transaction.transaction_type == "receipt":
             if old_status != "COMPLETED" and new_status == "COMPLETED":
                 # Add to inventory when changing to COMPLETED
-                if inventory:
-                    inventory.quantity += transaction.quantity
-                else:
-                    inventory = models.Inventory(
-                        product_id=transaction.product_id,
-                        warehouse_id=transaction.warehouse_id,
-                        quantity=transaction.quantity
-                    )
-                    db.add(inventory)
+                delta = transaction.quantity
+                current_quantity = stock.add_stock(db, product_id, warehouse_id, delta)
             elif old_status == "COMPLETED" and new_status != "COMPLETED":
                 # Remove from inventory when changing from COMPLETED
-                if inventory:
-                    inventory.quantity -= transaction.quantity
+                delta = -transaction.quantity
+                current_quantity = stock.add_stock(db, product_id, warehouse_id, delta)
         
         # Handle delivery status changes
         elif transaction.transaction_type == "delivery":
             if old_status != "SHIPPED" and new_status == "SHIPPED":
                 # Remove from inventory when changing to SHIPPED
-                if not inventory or inventory.quantity < abs(transaction.quantity):
-                    available = inventory.quantity if inventory else 0
+                delta = -abs(transaction.quantity)
+                try:
+                    current_quantity = stock.remove_stock(db, product_id, warehouse_id, abs(transaction.quantity))
+                except stock.InsufficientStock as e:
                     raise HTTPException(
                         status_code=400,
-                        detail=f"Insufficient stock. Available: {available}, Required: {abs(transaction.quantity)}"
+                        detail=f"Insufficient stock. Available: {e.available}, Required: {abs(transaction.quantity)}"
                     )
-                inventory.quantity -= abs(transaction.quantity)
             elif old_status == "SHIPPED" and new_status != "SHIPPED":
                 # Add back to inventory when changing from SHIPPED
-                if inventory:
-                    inventory.quantity += abs(transaction.quantity)
-        
-        # Update transaction status
+                delta = abs(transaction.quantity)
+                current_quantity = stock.add_stock(db, product_id, warehouse_id, delta)
+        
+        if current_quantity is None:
+            current_quantity = stock.get_quantity(db, product_id, warehouse_id)
+        
+        # applied_at records when the quantity first hit inventory; every later
+        # flip (revert, re-apply) is a reversal row in the ledger, so history
+        # rebuilt from snapshots sees the stock move both ways
+        reversal = None
+        if delta:
+            now = datetime.utcnow()
+            if transaction.applied_at is None:
+                transaction.applied_at = now
+            else:
+                reversal = models.Transaction(
+                    product_id=product_id,
+                    warehouse_id=warehouse_id,
+                    transaction_type=f"{transaction.transaction_type}{models.REVERSAL_SUFFIX}",
+                    quantity=delta,
+                    reference=f"Reversal of {transaction.transaction_type} #{transaction.id}",
+                    notes=f"Status {old_status} → {new_status}",
+                    status="DONE",
+                    timestamp=now,
+                    applied_at=now,
+                )
+                db.add(reversal)
         transaction.status = new_status
+        db.flush()
         
-        db.commit()
+        names = db.execute(
+            select(
+                models.Product.name,
+                select(models.Warehouse.name).where(models.Warehouse.id == warehouse_id).scalar_subquery(),
+            ).where(models.Product.id == product_id)
+        ).one()
+        events = [_transaction_event(row, names[0], names[1] or "") for row in (transaction, reversal) if row is not None]
         
-        current_quantity = inventory.quantity if inventory else 0
-        
-        return {
+        result = {
             "success": True,
             "message": f"Status updated from {old_status} to {new_status}",
             "transaction_id": transaction.id,
             "new_quantity": current_quantity
         }
+        idempotency.record(db, schemas.OperationResponse, result)
+        
+        db.commit()
+        
+        _publish(events, [_stock_event(product_id, warehouse_id, current_quantity, delta)] if delta else [])
+        
+        return result
     except HTTPException:
         db.rollback()
         raise
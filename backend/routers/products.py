@@ -1,17 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-import models, schemas
-from database import get_db
+import models, schemas, search, versioning
+from database import get_db, get_read_db
 
 router = APIRouter(
     prefix="/products",
     tags=["products"],
 )
 
+def _products_with_quantity():
+    """Products joined to their materialized stock total (product_stock, kept by stock.py)."""
+    return (
+        select(
+            models.Product.id,
+            models.Product.name,
+            models.Product.sku,
+            models.Product.category,
+            models.Product.unit_of_measure,
+            func.coalesce(models.ProductStock.quantity, 0).label("quantity"),
+        )
+        .outerjoin(models.ProductStock, models.ProductStock.product_id == models.Product.id)
+    )
+
 @router.post("/", response_model=schemas.Product)
 def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)):
     db_product = db.query(models.Product).filter(models.Product.sku == product.sku).first()
@@ -24,25 +39,73 @@ def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)
     return new_product
 
 @router.get("/", response_model=List[schemas.Product])
-def read_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    products = db.query(models.Product).offset(skip).limit(limit).all()
-    # Add quantity from inventory
-    result = []
-    for product in products:
-        product_dict = {
-            "id": product.id,
-            "name": product.name,
-            "sku": product.sku,
-            "category": product.category,
-            "unit_of_measure": product.unit_of_measure,
-            "quantity": sum([inv.quantity for inv in product.inventory]) if product.inventory else 0
-        }
-        result.append(product_dict)
-    return result
+def read_products(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+):
+    """
+    List products with their total quantity across warehouses.
+    Pass the X-Next-Cursor header of the previous page as `cursor` for keyset
+    pagination (id > cursor); `skip` still works but gets slower on deep pages.
+    """
+    cached = versioning.not_modified(request, response, db, ("products", "inventory"))
+    if cached:
+        return cached
+
+    query = _products_with_quantity().order_by(models.Product.id)
+    if cursor is not None:
+        query = query.where(models.Product.id > cursor)
+    elif skip:
+        query = query.offset(skip)
+
+    rows = db.execute(query.limit(limit)).mappings().all()
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1]["id"])
+    return rows
+
+@router.get("/search", response_model=List[schemas.ProductSearchResult])
+def search_products(
+    request: Request,
+    response: Response,
+    q: str,
+    category: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+    db: Session = Depends(get_read_db),
+):
+    """
+    Ranked, typo-tolerant search over name, SKU and category (see search.py).
+    When a full page is returned, X-Next-Cursor holds the `offset` of the next one.
+    """
+    cached = versioning.not_modified(request, response, db, ("products", "inventory"))
+    if cached:
+        return cached
+
+    limit = max(1, min(limit, 100))
+    offset = max(offset, 0)
+    rows = search.search_products(db, q, category=category, limit=limit, offset=offset)
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(offset + limit)
+    return rows
+
+@router.get("/autocomplete", response_model=List[schemas.SkuSuggestion])
+def autocomplete_skus(
+    prefix: str,
+    limit: int = 10,
+    db: Session = Depends(get_read_db),
+):
+    """Products whose SKU starts with `prefix`, case-insensitive, in SKU order."""
+    return search.autocomplete_skus(db, prefix, max(1, min(limit, 50)))
 
 @router.get("/{product_id}", response_model=schemas.Product)
-def read_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+def read_product(product_id: int, db: Session = Depends(get_read_db)):
+    product = db.execute(
+        _products_with_quantity().where(models.Product.id == product_id)
+    ).mappings().first()
     if product is None:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
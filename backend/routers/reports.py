@@ -0,0 +1,223 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import case, func, literal, null, select
+from sqlalchemy.orm import Session
+from datetime import date, datetime, time, timedelta
+from typing import List, Literal, Optional
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import models, schemas, ledger, versioning
+from database import get_db
+
+router = APIRouter(
+    prefix="/reports",
+    tags=["reports"],
+)
+
+REPORT_TABLES = ("transactions", "inventory", "products", "warehouses")
+
+GroupBy = Literal["product", "warehouse", "category"]
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min)
+
+def _end_of_day(day: date) -> datetime:
+    """Last instant of `day`; as-of queries include movements up to and including it."""
+    return _day_start(day + timedelta(days=1)) - timedelta(microseconds=1)
+
+def _check_range(start: date, end: date):
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+
+def _grouping(group_by: str, source):
+    """(group id column, group label column, joined FROM clause) for a movement source."""
+    query = source.join(models.Product, models.Product.id == source.c.product_id)
+    if group_by == "product":
+        return source.c.product_id, models.Product.name, query
+    if group_by == "warehouse":
+        query = query.join(models.Warehouse, models.Warehouse.id == source.c.warehouse_id)
+        return source.c.warehouse_id, models.Warehouse.name, query
+    return null(), models.Product.category, query
+
+def _filter(query, source, product_id: Optional[int], warehouse_id: Optional[int]):
+    if product_id is not None:
+        query = query.where(source.c.product_id == product_id)
+    if warehouse_id is not None:
+        query = query.where(source.c.warehouse_id == warehouse_id)
+    return query
+
+@router.get("/movements", response_model=List[schemas.MovementReportRow])
+def movement_report(
+    request: Request,
+    response: Response,
+    start: date,
+    end: date,
+    group_by: GroupBy = "product",
+    product_id: Optional[int] = None,
+    warehouse_id: Optional[int] = None,
+    engine: Literal["sql", "pandas"] = "sql",
+    db: Session = Depends(get_db),
+):
+    """
+    Daily inbound, outbound and net movement per group between start and end
+    (inclusive, UTC days), with the running net per group since start.
+    """
+    _check_range(start, end)
+    cached = versioning.not_modified(request, response, db, REPORT_TABLES)
+    if cached:
+        return cached
+
+    moves = ledger.movements(_day_start(start), _day_start(end + timedelta(days=1)))
+    group_id, group_label, source = _grouping(group_by, moves)
+
+    if engine == "pandas":
+        return _movement_report_pandas(db, moves, group_id, group_label, source, product_id, warehouse_id)
+
+    day = func.date(moves.c.applied_at)
+    group_keys = [day, group_label] if group_by == "category" else [day, group_id, group_label]
+    partition = group_keys[1:]
+    query = (
+        select(
+            day.label("day"),
+            group_id.label("group_id"),
+            group_label.label("group"),
+            func.sum(case((moves.c.flow > 0, moves.c.quantity), else_=0)).label("inbound"),
+            func.sum(case((moves.c.flow < 0, -moves.c.quantity), else_=0)).label("outbound"),
+            func.sum(moves.c.quantity).label("net"),
+            func.sum(func.sum(moves.c.quantity)).over(partition_by=partition, order_by=day).label("cumulative_net"),
+        )
+        .select_from(source)
+        .group_by(*group_keys)
+        .order_by(day, *partition)
+    )
+    query = _filter(query, moves, product_id, warehouse_id)
+    return [row._asdict() for row in db.execute(query)]
+
+def _movement_report_pandas(db: Session, moves, group_id, group_label, source, product_id, warehouse_id):
+    """Same report as the SQL path, aggregated with pandas over the exported columns."""
+    # Optional dependency, imported on first use so it does not slow down startup
+    try:
+        import numpy as np
+        import pandas as pd
+    except ImportError:
+        raise HTTPException(status_code=400, detail="engine=pandas requires pandas and numpy to be installed")
+
+    query = select(
+        moves.c.applied_at,
+        group_id.label("group_id"),
+        group_label.label("group"),
+        moves.c.quantity,
+        moves.c.flow,
+    ).select_from(source)
+    query = _filter(query, moves, product_id, warehouse_id)
+    frame = pd.read_sql(query, db.connection())
+    if frame.empty:
+        return []
+
+    quantity = frame["quantity"].to_numpy(dtype="float64")
+    flow = frame["flow"].to_numpy(dtype="float64")
+    frame["day"] = pd.to_datetime(frame["applied_at"]).dt.date
+    frame["inbound"] = np.where(flow > 0, quantity, 0.0)
+    frame["outbound"] = np.where(flow < 0, -quantity, 0.0)
+
+    keys = ["group_id", "group"]
+    daily = (
+        frame.groupby(keys + ["day"], dropna=False, sort=True)[["inbound", "outbound", "quantity"]]
+        .sum()
+        .rename(columns={"quantity": "net"})
+        .reset_index()
+    )
+    daily["cumulative_net"] = daily.groupby(keys, dropna=False)["net"].cumsum()
+    daily = daily.sort_values(["day", "group_id", "group"], kind="stable")
+    daily["group_id"] = daily["group_id"].astype("object").where(daily["group_id"].notna(), None)
+    return daily.to_dict(orient="records")
+
+@router.get("/stock-as-of", response_model=List[schemas.StockReportRow])
+def stock_as_of_report(
+    request: Request,
+    response: Response,
+    on: date,
+    group_by: GroupBy = "product",
+    warehouse_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """Stock per group at the end of day `on` (UTC), rebuilt from the nearest snapshot."""
+    cached = versioning.not_modified(request, response, db, REPORT_TABLES)
+    if cached:
+        return cached
+
+    _, moves = ledger.as_of_movements(db, _end_of_day(on), warehouse_id=warehouse_id)
+    group_id, group_label, source = _grouping(group_by, moves)
+    group_keys = [group_label] if group_by == "category" else [group_id, group_label]
+    query = (
+        select(
+            group_id.label("group_id"),
+            group_label.label("group"),
+            func.sum(moves.c.quantity).label("quantity"),
+        )
+        .select_from(source)
+        .group_by(*group_keys)
+        .order_by(*group_keys)
+    )
+    return [row._asdict() for row in db.execute(query)]
+
+@router.get("/turnover", response_model=List[schemas.TurnoverReportRow])
+def turnover_report(
+    request: Request,
+    response: Response,
+    start: date,
+    end: date,
+    warehouse_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Per product over [start, end]: opening and closing stock, units shipped,
+    turnover (shipped / average of opening and closing stock) and days of
+    cover (closing stock / average units shipped per day).
+    """
+    _check_range(start, end)
+    cached = versioning.not_modified(request, response, db, REPORT_TABLES)
+    if cached:
+        return cached
+
+    def stock_at(at: datetime):
+        _, moves = ledger.as_of_movements(db, at, warehouse_id=warehouse_id)
+        return (
+            select(moves.c.product_id, func.sum(moves.c.quantity).label("quantity"))
+            .group_by(moves.c.product_id)
+            .subquery()
+        )
+
+    opening = stock_at(_day_start(start) - timedelta(microseconds=1))
+    closing = stock_at(_end_of_day(end))
+
+    moves = ledger.movements(_day_start(start), _day_start(end + timedelta(days=1)))
+    # Booked type, so reverted deliveries net out of the units shipped
+    shipped = _filter(
+        select(moves.c.product_id, func.sum(-moves.c.quantity).label("quantity"))
+        .where(moves.c.transaction_type == "delivery")
+        .group_by(moves.c.product_id),
+        moves, None, warehouse_id,
+    ).subquery()
+
+    opening_qty = func.coalesce(opening.c.quantity, 0)
+    closing_qty = func.coalesce(closing.c.quantity, 0)
+    outbound = func.coalesce(shipped.c.quantity, 0)
+    days = literal((end - start).days + 1)
+    query = (
+        select(
+            models.Product.id.label("product_id"),
+            models.Product.name.label("product_name"),
+            models.Product.sku,
+            opening_qty.label("opening_stock"),
+            closing_qty.label("closing_stock"),
+            outbound.label("outbound"),
+            (outbound / func.nullif((opening_qty + closing_qty) / 2.0, 0)).label("turnover"),
+            (closing_qty / func.nullif(outbound * 1.0 / days, 0)).label("days_of_cover"),
+        )
+        .outerjoin(opening, opening.c.product_id == models.Product.id)
+        .outerjoin(closing, closing.c.product_id == models.Product.id)
+        .outerjoin(shipped, shipped.c.product_id == models.Product.id)
+        .order_by(models.Product.id)
+    )
+    return [row._asdict() for row in db.execute(query)]
@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from typing import List
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-import models, schemas
-from database import get_db
+import models, schemas, versioning
+from database import get_db, get_read_db
 
 router = APIRouter(
     prefix="/warehouses",
@@ -24,37 +25,78 @@ def create_warehouse(warehouse: schemas.WarehouseCreate, db: Session = Depends(g
     return new_warehouse
 
 @router.get("/", response_model=List[schemas.Warehouse])
-def read_warehouses(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_warehouses(request: Request, response: Response, skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
+    cached = versioning.not_modified(request, response, db, ("warehouses",))
+    if cached:
+        return cached
     warehouses = db.query(models.Warehouse).offset(skip).limit(limit).all()
     return warehouses
 
 
 @router.get("/inventory")
-def get_warehouse_inventory(db: Session = Depends(get_db)):
-    """Get inventory summary for all warehouses"""
-    warehouses = db.query(models.Warehouse).all()
-    
+def get_warehouse_inventory(
+    request: Request,
+    response: Response,
+    by_category: bool = False,
+    db: Session = Depends(get_read_db),
+):
+    """
+    Get inventory summary for all warehouses.
+    Totals come from one GROUP BY warehouse_id aggregate; by_category adds a
+    per-category breakdown from a second aggregate, independent of warehouse count.
+    """
+    cached = versioning.not_modified(request, response, db, ("warehouses", "inventory", "products"))
+    if cached:
+        return cached
+
+    rows = db.execute(
+        select(
+            models.Warehouse.id,
+            models.Warehouse.name,
+            func.count(models.Inventory.id).label("total_items"),
+            func.coalesce(func.sum(models.Inventory.quantity), 0).label("total_quantity"),
+        )
+        .outerjoin(models.Inventory, models.Inventory.warehouse_id == models.Warehouse.id)
+        .group_by(models.Warehouse.id, models.Warehouse.name)
+        .order_by(models.Warehouse.id)
+    ).all()
+
     result = []
-    for warehouse in warehouses:
-        inventories = db.query(models.Inventory).filter(
-            models.Inventory.warehouse_id == warehouse.id
-        ).all()
-        
-        total_items = len(inventories)
-        total_quantity = sum([inv.quantity for inv in inventories])
-        
+    for row in rows:
         result.append({
-            "warehouse_id": warehouse.id,
-            "warehouse_name": warehouse.name,
-            "total_items": total_items,
-            "total_quantity": int(total_quantity)
+            "warehouse_id": row.id,
+            "warehouse_name": row.name,
+            "total_items": row.total_items,
+            "total_quantity": int(row.total_quantity)
         })
-    
+
+    if by_category:
+        categories = {}
+        category_rows = db.execute(
+            select(
+                models.Inventory.warehouse_id,
+                models.Product.category,
+                func.count(models.Inventory.id).label("total_items"),
+                func.coalesce(func.sum(models.Inventory.quantity), 0).label("total_quantity"),
+            )
+            .join(models.Product, models.Product.id == models.Inventory.product_id)
+            .group_by(models.Inventory.warehouse_id, models.Product.category)
+            .order_by(models.Product.category)
+        ).all()
+        for row in category_rows:
+            categories.setdefault(row.warehouse_id, []).append({
+                "category": row.category,
+                "total_items": row.total_items,
+                "total_quantity": int(row.total_quantity)
+            })
+        for summary in result:
+            summary["categories"] = categories.get(summary["warehouse_id"], [])
+
     return result
 
 
 @router.get("/{warehouse_id}/items")
-def get_warehouse_items(warehouse_id: int, db: Session = Depends(get_db)):
+def get_warehouse_items(warehouse_id: int, db: Session = Depends(get_read_db)):
     """Get all items in a specific warehouse"""
     warehouse = db.query(models.Warehouse).filter(models.Warehouse.id == warehouse_id).first()
     if not warehouse:
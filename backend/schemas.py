@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List, Literal, Union, Annotated
+from datetime import date, datetime
 
 # User Schemas
 class UserCreate(BaseModel):
@@ -48,6 +48,14 @@ class Product(ProductBase):
     class Config:
         from_attributes = True
 
+class ProductSearchResult(Product):
+    score: float
+
+class SkuSuggestion(BaseModel):
+    id: int
+    sku: str
+    name: str
+
 class WarehouseBase(BaseModel):
     name: str
     location: str
@@ -97,11 +105,66 @@ class OperationResponse(BaseModel):
     success: bool
     message: str
     transaction_id: int
-    new_quantity: int
+    new_quantity: float
 
 class StatusUpdate(BaseModel):
     status: str
 
+# Bulk Operation Schemas
+
+class BulkReceipt(ReceiptCreate):
+    type: Literal["receipt"]
+
+class BulkDelivery(DeliveryCreate):
+    type: Literal["delivery"]
+
+class BulkTransfer(TransferCreate):
+    type: Literal["transfer"]
+
+class BulkAdjustment(AdjustmentCreate):
+    type: Literal["adjustment"]
+
+BulkOperationItem = Annotated[
+    Union[BulkReceipt, BulkDelivery, BulkTransfer, BulkAdjustment],
+    Field(discriminator="type"),
+]
+
+class BulkOperationRequest(BaseModel):
+    operations: List[BulkOperationItem] = Field(..., max_length=10000)
+    atomic: bool = True  # True: all-or-nothing, False: best-effort
+
+class BulkItemResult(BaseModel):
+    index: int
+    success: bool
+    message: str
+    transaction_id: Optional[int] = None
+    new_quantity: Optional[float] = None
+
+class BulkOperationResponse(BaseModel):
+    success: bool
+    applied: int
+    failed: int
+    results: List[BulkItemResult]
+
+# Ingest Queue Schemas (write-behind mode, see ingest.py)
+
+class QueuedOperationsRequest(BaseModel):
+    operations: List[BulkOperationItem] = Field(..., min_length=1, max_length=10000)
+
+class QueuedOperation(BaseModel):
+    id: str
+    status: str  # queued, applying, applied, failed
+    transaction_id: Optional[int] = None
+    new_quantity: Optional[float] = None
+    message: Optional[str] = None
+
+class IngestQueueStatus(BaseModel):
+    enabled: bool
+    queued: int = 0
+    applying: int = 0
+    applied: int = 0
+    failed: int = 0
+
 class TransactionHistory(BaseModel):
     id: int
     product_name: str
@@ -115,3 +178,118 @@ class TransactionHistory(BaseModel):
     
     class Config:
         from_attributes = True
+
+# Stock History Schemas
+class StockSnapshot(BaseModel):
+    id: int
+    taken_at: datetime
+    row_count: int
+
+    class Config:
+        from_attributes = True
+
+class StockLevel(BaseModel):
+    product_id: int
+    warehouse_id: int
+    quantity: float
+
+class StockAsOfResponse(BaseModel):
+    at: datetime
+    snapshot_id: Optional[int] = None  # None: rolled back from live inventory
+    items: List[StockLevel]
+
+class ArchiveResult(BaseModel):
+    archived: int
+
+class ArchivePeriod(BaseModel):
+    period: str
+    transactions: int
+
+class ArchivedTransaction(BaseModel):
+    id: int
+    period: str
+    product_id: int
+    warehouse_id: Optional[int]
+    transaction_type: str
+    quantity: float
+    reference: Optional[str]
+    notes: Optional[str]
+    status: Optional[str]
+    timestamp: Optional[datetime]
+    applied_at: datetime
+
+    class Config:
+        from_attributes = True
+
+# Report Schemas
+class MovementReportRow(BaseModel):
+    day: date
+    group_id: Optional[int] = None  # product / warehouse id; None when grouped by category
+    group: Optional[str]
+    inbound: float
+    outbound: float
+    net: float
+    cumulative_net: float
+
+class StockReportRow(BaseModel):
+    group_id: Optional[int] = None
+    group: Optional[str]
+    quantity: float
+
+class TurnoverReportRow(BaseModel):
+    product_id: int
+    product_name: str
+    sku: str
+    opening_stock: float
+    closing_stock: float
+    outbound: float
+    turnover: Optional[float]  # None when average stock is zero
+    days_of_cover: Optional[float]  # None when nothing shipped in the period
+
+# Alert Schemas
+class ReorderPointSet(BaseModel):
+    product_id: int
+    warehouse_id: int
+    reorder_point: float = Field(..., ge=0)
+
+class ReorderPoint(ReorderPointSet):
+    class Config:
+        from_attributes = True
+
+class LowStockAlert(BaseModel):
+    product_id: int
+    product_name: str
+    sku: str
+    warehouse_id: int
+    warehouse_name: str
+    quantity: float
+    reorder_point: float
+    raised_at: datetime
+
+# Import Schemas
+class ImportJob(BaseModel):
+    id: int
+    source: Optional[str]
+    format: str
+    status: str
+    update_existing: bool
+    rows_processed: int
+    products_created: int
+    products_updated: int
+    stock_rows: int
+    error_count: int
+    message: Optional[str]
+
+    class Config:
+        from_attributes = True
+
+class ImportRowError(BaseModel):
+    row_number: int
+    sku: Optional[str]
+    message: str
+
+    class Config:
+        from_attributes = True
+
+class ImportJobResult(ImportJob):
+    errors: List[ImportRowError] = []  # the first rejected rows; page the rest via /imports/{id}/errors
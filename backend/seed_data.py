@@ -1,11 +1,10 @@
-from database import SessionLocal, engine, Base
+from database import SessionLocal
 import models
+import stock
+from low_stock import DEFAULT_REORDER_POINT
 
 def seed_database():
-    """Seed the database with sample electronics warehouse data"""
-    # Create all tables first
-    Base.metadata.create_all(bind=engine)
-    
+    """Seed the database with sample electronics warehouse data (schema must exist, see bootstrap.py)"""
     db = SessionLocal()
     
     try:
@@ -95,35 +94,35 @@ def seed_database():
             {"name": "RGB LED Strips 2m", "sku": "ACC-LED-2M", "category": "Accessories", "unit": "units", "qty": 5},
         ]
         
-        # Create products and inventory
-        for item in products_data:
-            product = models.Product(
+        # Create products in one flush, then their inventory
+        products = [
+            models.Product(
                 name=item["name"],
                 sku=item["sku"],
                 category=item["category"],
                 unit_of_measure=item["unit"]
             )
-            db.add(product)
-            db.commit()
-            db.refresh(product)
-            
+            for item in products_data
+        ]
+        db.add_all(products)
+        db.flush()
+        
+        for item, product in zip(products_data, products):
             # Create inventory entries for both warehouses
             # Split inventory between warehouse A and B
             qty_a = item["qty"] // 2
             qty_b = item["qty"] - qty_a
             
-            inventory_a = models.Inventory(
-                product_id=product.id,
-                warehouse_id=warehouse_a.id,
-                quantity=qty_a
-            )
-            inventory_b = models.Inventory(
-                product_id=product.id,
-                warehouse_id=warehouse_b.id,
-                quantity=qty_b
-            )
-            db.add(inventory_a)
-            db.add(inventory_b)
+            stock.add_stock(db, product.id, warehouse_a.id, qty_a)
+            stock.add_stock(db, product.id, warehouse_b.id, qty_b)
+            
+            # Reorder points per warehouse; the low stock items start below them
+            for warehouse in (warehouse_a, warehouse_b):
+                db.add(models.ReorderPoint(
+                    product_id=product.id,
+                    warehouse_id=warehouse.id,
+                    reorder_point=item.get("reorder_point", DEFAULT_REORDER_POINT),
+                ))
         
         db.commit()
         print(f"✅ Successfully seeded database with {len(products_data)} electronics products!")
@@ -0,0 +1,233 @@
+"""
+Inventory mutation helpers.
+
+Every change to an Inventory row goes through these functions so the
+operation handlers never do a read-modify-write on quantity themselves.
+Increments are a single INSERT ... ON CONFLICT (product_id, warehouse_id)
+DO UPDATE statement on PostgreSQL and SQLite; decrements are a single
+conditional UPDATE ... WHERE quantity >= :q, so concurrent deliveries
+cannot oversell and only the affected row is locked.
+
+The same calls keep product_stock (total per product) in step, inside the
+caller's transaction; verify_totals/rebuild_totals detect and repair drift.
+They also record the (product, warehouse) pairs they changed in
+session.info[TOUCHED_PAIRS] for commit-time consumers such as low_stock.py.
+"""
+from collections import defaultdict
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+import models
+
+_UPSERT_DIALECTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+TOUCHED_PAIRS = "stock_touched_pairs"
+
+
+class InsufficientStock(Exception):
+    """Raised when a decrement would take a row below zero."""
+
+    def __init__(self, product_id: int, warehouse_id: int, available: float, requested: float):
+        super().__init__(f"Insufficient stock. Available: {available}, Requested: {requested}")
+        self.product_id = product_id
+        self.warehouse_id = warehouse_id
+        self.available = available
+        self.requested = requested
+
+
+def _upsert_insert(db: Session):
+    return _UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+
+
+def mark_touched(db: Session, pairs):
+    db.info.setdefault(TOUCHED_PAIRS, set()).update(pairs)
+
+
+def _add_product_totals(db: Session, deltas: dict):
+    """Apply {product_id: delta} to product_stock."""
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    insert = _upsert_insert(db)
+    if insert is None:
+        for product_id, delta in deltas.items():
+            total = db.get(models.ProductStock, product_id, with_for_update=True)
+            if total:
+                total.quantity += delta
+            else:
+                db.add(models.ProductStock(product_id=product_id, quantity=delta))
+        db.flush()
+        return
+
+    rows = [{"product_id": product_id, "quantity": delta} for product_id, delta in sorted(deltas.items())]
+    stmt = insert(models.ProductStock)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["product_id"],
+        set_={"quantity": models.ProductStock.quantity + stmt.excluded.quantity},
+    )
+    db.execute(stmt, rows)
+
+
+def get_quantity(db: Session, product_id: int, warehouse_id: int, for_update: bool = False) -> float:
+    """Current quantity of a (product, warehouse) row, 0 if it does not exist."""
+    query = select(models.Inventory.quantity).where(
+        models.Inventory.product_id == product_id,
+        models.Inventory.warehouse_id == warehouse_id,
+    )
+    if for_update:
+        query = query.with_for_update()
+    return db.execute(query).scalar() or 0
+
+
+def add_stock(db: Session, product_id: int, warehouse_id: int, delta: float) -> float:
+    """
+    Atomically add delta (may be negative) to a row, creating it if missing.
+    Returns the new quantity.
+    """
+    insert = _upsert_insert(db)
+    if insert is None:
+        # Dialects without ON CONFLICT: read-modify-write under a row lock
+        inventory = db.query(models.Inventory).filter(
+            models.Inventory.product_id == product_id,
+            models.Inventory.warehouse_id == warehouse_id,
+        ).with_for_update().first()
+        if inventory:
+            inventory.quantity += delta
+        else:
+            inventory = models.Inventory(product_id=product_id, warehouse_id=warehouse_id, quantity=delta)
+            db.add(inventory)
+        db.flush()
+        new_quantity = inventory.quantity
+    else:
+        stmt = insert(models.Inventory).values(
+            product_id=product_id,
+            warehouse_id=warehouse_id,
+            quantity=delta,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["product_id", "warehouse_id"],
+            set_={"quantity": models.Inventory.quantity + stmt.excluded.quantity},
+        ).returning(models.Inventory.quantity)
+        new_quantity = db.execute(stmt).scalar_one()
+
+    mark_touched(db, [(product_id, warehouse_id)])
+    _add_product_totals(db, {product_id: delta})
+    return new_quantity
+
+
+def add_stock_many(db: Session, deltas: dict):
+    """
+    Apply {(product_id, warehouse_id): delta} as one executemany upsert; the
+    statement compiles once and the driver batches the rows.
+    Keys must be unique, so callers group their deltas first.
+    """
+    # An executemany with no rows would run the insert once without
+    # parameters and leave a NULL-keyed inventory row
+    if not deltas:
+        return
+    insert = _upsert_insert(db)
+    if insert is None:
+        for (product_id, warehouse_id), delta in deltas.items():
+            add_stock(db, product_id, warehouse_id, delta)
+        return
+
+    rows = [
+        {"product_id": product_id, "warehouse_id": warehouse_id, "quantity": delta}
+        for (product_id, warehouse_id), delta in deltas.items()
+    ]
+    # Sorted so concurrent batches lock rows in the same order
+    rows.sort(key=lambda row: (row["product_id"], row["warehouse_id"]))
+    stmt = insert(models.Inventory)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["product_id", "warehouse_id"],
+        set_={"quantity": models.Inventory.quantity + stmt.excluded.quantity},
+    )
+    db.execute(stmt, rows)
+    mark_touched(db, deltas)
+
+    totals = defaultdict(float)
+    for (product_id, _), delta in deltas.items():
+        totals[product_id] += delta
+    _add_product_totals(db, totals)
+
+
+def remove_stock(db: Session, product_id: int, warehouse_id: int, quantity: float) -> float:
+    """
+    Atomically take quantity out of a row if enough is available.
+    Returns the new quantity; raises InsufficientStock otherwise.
+    """
+    stmt = (
+        update(models.Inventory)
+        .where(
+            models.Inventory.product_id == product_id,
+            models.Inventory.warehouse_id == warehouse_id,
+            models.Inventory.quantity >= quantity,
+        )
+        .values(quantity=models.Inventory.quantity - quantity)
+        .execution_options(synchronize_session=False)
+    )
+
+    new_quantity = None
+    if db.get_bind().dialect.update_returning:
+        new_quantity = db.execute(stmt.returning(models.Inventory.quantity)).scalar()
+    elif db.execute(stmt).rowcount:
+        new_quantity = get_quantity(db, product_id, warehouse_id)
+
+    if new_quantity is None:
+        raise InsufficientStock(product_id, warehouse_id, get_quantity(db, product_id, warehouse_id), quantity)
+
+    mark_touched(db, [(product_id, warehouse_id)])
+    _add_product_totals(db, {product_id: -quantity})
+    return new_quantity
+
+
+def set_stock(db: Session, product_id: int, warehouse_id: int, quantity: float) -> float:
+    """
+    Set a row to an absolute count (stock adjustments).
+    The old value is read under a row lock and the difference applied as a delta.
+    Returns the previous quantity.
+    """
+    old_quantity = get_quantity(db, product_id, warehouse_id, for_update=True)
+    add_stock(db, product_id, warehouse_id, quantity - old_quantity)
+    return old_quantity
+
+
+def _actual_totals():
+    """Per-product totals recomputed from inventory, for every product."""
+    return (
+        select(
+            models.Product.id.label("product_id"),
+            func.coalesce(func.sum(models.Inventory.quantity), 0).label("quantity"),
+        )
+        .outerjoin(models.Inventory, models.Inventory.product_id == models.Product.id)
+        .group_by(models.Product.id)
+    )
+
+
+def verify_totals(db: Session, tolerance: float = 1e-6) -> list:
+    """Products whose product_stock total differs from the sum of their inventory rows."""
+    actual = _actual_totals().subquery()
+    rows = db.execute(
+        select(
+            actual.c.product_id,
+            func.coalesce(models.ProductStock.quantity, 0).label("stored"),
+            actual.c.quantity.label("actual"),
+        )
+        .outerjoin(models.ProductStock, models.ProductStock.product_id == actual.c.product_id)
+        .order_by(actual.c.product_id)
+    ).all()
+    return [row for row in rows if abs(row.stored - row.actual) > tolerance]
+
+
+def rebuild_totals(db: Session):
+    """Recompute product_stock from inventory. The caller commits."""
+    db.execute(delete(models.ProductStock))
+    db.execute(insert(models.ProductStock).from_select(["product_id", "quantity"], _actual_totals()))
+
+
+# Registers the commit-time low-stock evaluation of TOUCHED_PAIRS
+import low_stock  # noqa: E402,F401
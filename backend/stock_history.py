@@ -0,0 +1,39 @@
+"""
+Take stock snapshots and archive old transactions; meant for a cron job.
+
+    python stock_history.py snapshot                    # checkpoint current stock
+    python stock_history.py archive --older-than-days 90
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from database import SessionLocal
+import ledger
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stock snapshots and transaction archival")
+    parser.add_argument("command", choices=["snapshot", "archive"])
+    parser.add_argument("--older-than-days", type=int, default=90, help="archive: age cutoff in days")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "snapshot":
+            snapshot = ledger.take_snapshot(db)
+            db.commit()
+            print(f"✅ Snapshot {snapshot.id} at {snapshot.taken_at}: {snapshot.row_count} inventory rows")
+            return
+
+        # Snapshot first so as-of queries past the cutoff start from it, not the archive
+        ledger.take_snapshot(db)
+        db.commit()
+        before = datetime.utcnow() - timedelta(days=args.older_than_days)
+        archived = ledger.archive_transactions(db, before)
+        print(f"✅ Archived {archived} transactions applied before {before:%Y-%m-%d}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Verify or rebuild the materialized per-product stock totals.
+
+    python stock_totals.py verify    # exit code 1 and a report if totals drifted
+    python stock_totals.py rebuild   # recompute product_stock from inventory
+"""
+import argparse
+import sys
+
+from database import SessionLocal
+import stock
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify or rebuild product_stock totals")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            stock.rebuild_totals(db)
+            db.commit()
+            print("✅ Rebuilt product stock totals")
+            return
+
+        drift = stock.verify_totals(db)
+        if not drift:
+            print("✅ Product stock totals match inventory")
+            return
+        print(f"❌ {len(drift)} product totals drifted from inventory:")
+        for row in drift:
+            print(f"  product {row.product_id}: stored {row.stored}, actual {row.actual}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
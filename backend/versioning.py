@@ -0,0 +1,199 @@
+"""
+Version stamps for cheap conditional GETs.
+
+Every commit that writes to a tracked table bumps that table's counter in
+version_stamps, in a short transaction of its own right after the commit,
+so writers never hold the stamp rows' locks while their own transaction
+runs. List endpoints derive their ETag from the counters they depend on,
+so answering If-None-Match costs one primary-key lookup instead of the
+aggregation queries. Until the bump lands a reader may briefly see the new
+rows under the old ETag; a process that dies in between leaves the stamp
+behind until the table's next write.
+Writes are detected through session events, covering ORM objects as well
+as the insert()/update() statements issued by the stock helpers.
+
+The same counters make the read-your-writes token for replica reads: a
+request commit returns the bumped versions in X-Consistency-Token. Each
+bump commits after the data it covers, so a replica is current for a
+client once its stamps have reached them.
+"""
+import hashlib
+import logging
+from itertools import chain
+from fastapi import Request, Response
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+from database import CONSISTENCY_HEADER
+import models
+
+logger = logging.getLogger("stockmaster.versioning")
+
+# table written -> version stamp it invalidates
+TRACKED_TABLES = {
+    "products": "products",
+    "warehouses": "warehouses",
+    "inventory": "inventory",
+    "product_stock": "inventory",
+    "reorder_points": "inventory",
+    "low_stock_alerts": "inventory",
+    "transactions": "transactions",
+    "transactions_archive": "transactions",
+}
+
+_STAMPS = frozenset(TRACKED_TABLES.values())
+
+_TOUCHED = "touched_tables"
+_PENDING = "pending_version_bump"
+
+
+def _touch(session, table_name):
+    stamp = TRACKED_TABLES.get(table_name)
+    if stamp:
+        session.info.setdefault(_TOUCHED, set()).add(stamp)
+
+
+def mark_changed(session, *table_names):
+    """Count writes the ORM cannot see (raw DBAPI calls such as COPY) toward the next commit."""
+    for table_name in table_names:
+        _touch(session, table_name)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_objects(session, flush_context):
+    for instance in chain(session.new, session.dirty, session.deleted):
+        _touch(session, getattr(instance, "__tablename__", None))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_statements(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            _touch(orm_execute_state.session, mapper.local_table.name)
+
+
+@event.listens_for(Session, "before_commit")
+def _hold_connection(session):
+    session.flush()
+    touched = session.info.pop(_TOUCHED, None)
+    if touched:
+        # Still checked out in after_commit, so the bump needs no second pool slot
+        session.info[_PENDING] = (sorted(touched), session.connection())
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_versions(session):
+    pending = session.info.pop(_PENDING, None)
+    if pending is None:
+        return
+    names, connection = pending
+    # A session joined to an outer transaction bumps inside it instead
+    joined = connection.in_transaction()
+    try:
+        committed = _bump(connection, names)
+        if not joined:
+            connection.commit()
+    except Exception:
+        if not joined:
+            connection.rollback()
+        logger.exception("Could not bump version stamps %s", names)
+        return
+    _send_consistency_token(session, committed)
+
+
+def _bump(connection, names) -> dict:
+    """Increment the named stamps, in sorted order; returns their new versions."""
+    committed = {}
+    for name in names:
+        version = connection.execute(
+            update(models.VersionStamp)
+            .where(models.VersionStamp.name == name)
+            .values(version=models.VersionStamp.version + 1)
+            .returning(models.VersionStamp.version)
+        ).scalar()
+        if version is None:
+            connection.execute(insert(models.VersionStamp).values(name=name, version=1))
+            version = 1
+        committed[name] = version
+    return committed
+
+
+def _send_consistency_token(session, committed: dict):
+    response = session.info.get("response")
+    if response is None:
+        return
+    # Carry the client's earlier writes (and earlier commits of this request)
+    # forward, so the client only has to keep the latest token
+    request = session.info.get("request")
+    tokens = [response.headers.get(CONSISTENCY_HEADER)]
+    if request is not None:
+        tokens.append(request.headers.get(CONSISTENCY_HEADER))
+    versions = {}
+    for name, version in chain(committed.items(), *(parse_token(token).items() for token in tokens)):
+        versions[name] = max(versions.get(name, 0), version)
+    response.headers[CONSISTENCY_HEADER] = format_token(versions)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_versions(session):
+    session.info.pop(_TOUCHED, None)
+    session.info.pop(_PENDING, None)
+
+
+def format_token(versions: dict) -> str:
+    return ",".join(f"{name}:{version}" for name, version in sorted(versions.items()))
+
+
+def parse_token(token) -> dict:
+    """{stamp name: version} from an X-Consistency-Token; unknown or malformed parts are ignored."""
+    versions = {}
+    for part in (token or "").split(","):
+        name, _, version = part.strip().partition(":")
+        if name in _STAMPS and version.isdigit():
+            versions[name] = int(version)
+    return versions
+
+
+def replica_caught_up(db: Session, token: str) -> bool:
+    """Whether the database behind `db` has every version named in the token."""
+    required = parse_token(token)
+    if not required:
+        return True
+    current = dict(read_versions(db, required))
+    return all(current[name] >= version for name, version in required.items())
+
+
+def ensure_stamps(db: Session):
+    """Create the stamp rows up front so bumps never race on the first insert."""
+    existing = set(db.execute(select(models.VersionStamp.name)).scalars())
+    for name in sorted(set(TRACKED_TABLES.values()) - existing):
+        db.add(models.VersionStamp(name=name, version=0))
+    db.commit()
+
+
+def read_versions(db: Session, tables) -> tuple:
+    rows = db.execute(
+        select(models.VersionStamp.name, models.VersionStamp.version)
+        .where(models.VersionStamp.name.in_(tables))
+    ).all()
+    versions = dict(rows)
+    return tuple((name, versions.get(name, 0)) for name in sorted(tables))
+
+
+def not_modified(request: Request, response: Response, db: Session, tables) -> Response:
+    """
+    Conditional GET for a list endpoint that depends on `tables`.
+    Returns a 304 response when the client's If-None-Match still matches;
+    otherwise sets ETag on `response` and returns None.
+    """
+    versions = read_versions(db, tables)
+    digest = hashlib.sha1(f"{request.url.path}?{request.url.query}|{versions}".encode()).hexdigest()
+    etag = f'W/"{digest[:20]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
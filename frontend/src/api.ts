@@ -9,18 +9,30 @@ const api = axios.create({
   },
 });
 
+// Latest X-Consistency-Token from a write; sent back so reads see our own writes
+let consistencyToken: string | null = null;
+
 // Add token to requests if available
 api.interceptors.request.use((config) => {
   const token = localStorage.getItem('token');
   if (token) {
     config.headers.Authorization = `Bearer ${token}`;
   }
+  if (consistencyToken) {
+    config.headers['X-Consistency-Token'] = consistencyToken;
+  }
   return config;
 });
 
 // Handle 401 errors (token expired)
 api.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    const token = response.headers['x-consistency-token'];
+    if (token) {
+      consistencyToken = token;
+    }
+    return response;
+  },
   (error) => {
     if (error.response?.status === 401) {
       localStorage.removeItem('token');
@@ -36,6 +48,11 @@ export const getProducts = async () => {
   return response.data;
 };
 
+export const searchProducts = async (query: string, limit = 50, offset = 0) => {
+  const response = await api.get('/products/search', { params: { q: query, limit, offset } });
+  return response.data;
+};
+
 export const createProduct = async (product: any) => {
   const response = await api.post('/products/', product);
   return response.data;
@@ -72,8 +89,13 @@ export const createAdjustment = async (adjustment: any) => {
   return response.data;
 };
 
-export const getRecentOperations = async () => {
-  const response = await api.get('/operations/recent/');
+export const createBulkOperations = async (operations: any[], atomic = true) => {
+  const response = await api.post('/operations/bulk/', { operations, atomic });
+  return response.data;
+};
+
+export const getRecentOperations = async (limit?: number) => {
+  const response = await api.get('/operations/recent/', { params: { limit } });
   return response.data;
 };
 
@@ -82,5 +104,33 @@ export const updateTransactionStatus = async (transactionId: number, status: str
   return response.data;
 };
 
+export const getLowStockAlerts = async (warehouseId?: number) => {
+  // Follow X-Next-Cursor so counts built from the list cover every alert
+  const alerts: any[] = [];
+  let cursor: string | undefined;
+  do {
+    const response = await api.get('/alerts/low-stock', {
+      params: { warehouse_id: warehouseId, limit: 1000, cursor },
+    });
+    alerts.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+  return alerts;
+};
+
+export const getReorderPoints = async (warehouseId?: number) => {
+  const response = await api.get('/alerts/reorder-points', { params: { warehouse_id: warehouseId } });
+  return response.data;
+};
+
+export const setReorderPoint = async (productId: number, warehouseId: number, reorderPoint: number) => {
+  const response = await api.put('/alerts/reorder-points', {
+    product_id: productId,
+    warehouse_id: warehouseId,
+    reorder_point: reorderPoint,
+  });
+  return response.data;
+};
+
 export default api;
 
@@ -1,6 +1,6 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { TrendingUp, TrendingDown, AlertTriangle, Package, TruckIcon, ArrowRightLeft } from 'lucide-react';
-import axios from 'axios';
+import { getLowStockAlerts, getProducts, getRecentOperations, getReorderPoints } from '../api';
 
 const API_BASE = 'http://localhost:8000';
 
@@ -21,26 +21,110 @@ interface Product {
   quantity: number;
 }
 
+interface InventoryChange {
+  product_id: number;
+  warehouse_id: number;
+  quantity: number;
+  delta: number;
+}
+
+interface LowStockAlert {
+  product_id: number;
+  warehouse_id: number;
+  quantity: number;
+  reorder_point: number;
+}
+
+interface ReorderPoint {
+  product_id: number;
+  warehouse_id: number;
+  reorder_point: number;
+}
+
+const pairKey = (productId: number, warehouseId: number) => `${productId}:${warehouseId}`;
+
 const Dashboard = () => {
   const [recentActivity, setRecentActivity] = useState<Transaction[]>([]);
   const [products, setProducts] = useState<Product[]>([]);
+  const [lowStockAlerts, setLowStockAlerts] = useState<LowStockAlert[]>([]);
   const [loading, setLoading] = useState(true);
+  // Reorder point per product:warehouse, so pushed stock changes update alerts without a refetch
+  const reorderPoints = useRef(new Map<string, number>());
 
   useEffect(() => {
     fetchDashboardData();
-    // Poll for updates every 5 seconds
-    const interval = setInterval(fetchDashboardData, 5000);
-    return () => clearInterval(interval);
+
+    // Live updates pushed by the backend instead of polling
+    const events = new EventSource(`${API_BASE}/events/stream`);
+
+    events.addEventListener('inventory', (event) => {
+      const changes: InventoryChange[] = JSON.parse((event as MessageEvent).data);
+      setProducts(prev => prev.map(product => {
+        const delta = changes
+          .filter(change => change.product_id === product.id)
+          .reduce((sum, change) => sum + change.delta, 0);
+        return delta ? { ...product, quantity: product.quantity + delta } : product;
+      }));
+      setLowStockAlerts(prev => applyLowStockChanges(prev, changes));
+    });
+
+    events.addEventListener('transaction', (event) => {
+      const transactions: Transaction[] = JSON.parse((event as MessageEvent).data);
+      setRecentActivity(prev => {
+        const updated = new Map(transactions.map(t => [t.id, t]));
+        const merged = prev.map(t => updated.get(t.id) ?? t);
+        const added = transactions.filter(t => !prev.some(p => p.id === t.id)).reverse();
+        return [...added, ...merged].slice(0, 10);
+      });
+    });
+
+    // Fell behind the stream or reconnected after a drop: reload once
+    events.addEventListener('resync', fetchDashboardData);
+    let connected = false;
+    events.onopen = () => {
+      if (connected) fetchDashboardData();
+      connected = true;
+    };
+
+    return () => events.close();
   }, []);
 
+  // Same rule as the backend's alert table: at or below the reorder point
+  const applyLowStockChanges = (alerts: LowStockAlert[], changes: InventoryChange[]) => {
+    const byPair = new Map(alerts.map(alert => [pairKey(alert.product_id, alert.warehouse_id), alert]));
+    for (const change of changes) {
+      const key = pairKey(change.product_id, change.warehouse_id);
+      const reorderPoint = reorderPoints.current.get(key);
+      if (reorderPoint === undefined) continue;
+      if (change.quantity <= reorderPoint) {
+        byPair.set(key, {
+          ...byPair.get(key),
+          product_id: change.product_id,
+          warehouse_id: change.warehouse_id,
+          quantity: change.quantity,
+          reorder_point: reorderPoint,
+        });
+      } else {
+        byPair.delete(key);
+      }
+    }
+    return Array.from(byPair.values());
+  };
+
   const fetchDashboardData = async () => {
     try {
-      const [activityRes, productsRes] = await Promise.all([
-        axios.get(`${API_BASE}/operations/recent/?limit=10`),
-        axios.get(`${API_BASE}/products/`)
+      const [activity, productList, alerts, points] = await Promise.all([
+        getRecentOperations(10),
+        getProducts(),
+        getLowStockAlerts(),
+        getReorderPoints(),
       ]);
-      setRecentActivity(activityRes.data);
-      setProducts(productsRes.data);
+      reorderPoints.current = new Map(
+        (points as ReorderPoint[]).map(point => [pairKey(point.product_id, point.warehouse_id), point.reorder_point])
+      );
+      setRecentActivity(activity);
+      setProducts(productList);
+      setLowStockAlerts(alerts);
     } catch (err) {
       console.error('Error fetching dashboard data:', err);
     } finally {
@@ -49,7 +133,7 @@ const Dashboard = () => {
   };
 
   const totalProducts = products.length;
-  const lowStockItems = products.filter(p => p.quantity < 10).length;
+  const lowStockItems = new Set(lowStockAlerts.map(alert => alert.product_id)).size;
   const pendingReceipts = recentActivity.filter(
     t => t.transaction_type === 'receipt' && t.status !== 'COMPLETED'
   ).length;
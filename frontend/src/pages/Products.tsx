@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import { getProducts, createProduct } from '../api';
+import { getProducts, createProduct, searchProducts } from '../api';
 import { Plus, Search } from 'lucide-react';
 
 interface Product {
@@ -15,6 +15,7 @@ const Products = () => {
   const [products, setProducts] = useState<Product[]>([]);
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [searchQuery, setSearchQuery] = useState('');
+  const [searchResults, setSearchResults] = useState<Product[] | null>(null);
   const [newProduct, setNewProduct] = useState({
     name: '',
     sku: '',
@@ -26,6 +27,28 @@ const Products = () => {
     fetchProducts();
   }, []);
 
+  // Search server-side (ranked, typo tolerant) once typing pauses
+  useEffect(() => {
+    const query = searchQuery.trim();
+    if (!query) {
+      setSearchResults(null);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const data = await searchProducts(query);
+        if (!cancelled) setSearchResults(data);
+      } catch (error) {
+        console.error("Failed to search products", error);
+      }
+    }, 250);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchQuery]);
+
   const fetchProducts = async () => {
     try {
       console.log('Fetching products...');
@@ -50,14 +73,7 @@ const Products = () => {
     }
   };
 
-  const filteredProducts = products.filter((product) => {
-    const query = searchQuery.toLowerCase();
-    return (
-      product.name.toLowerCase().includes(query) ||
-      product.sku.toLowerCase().includes(query) ||
-      product.category.toLowerCase().includes(query)
-    );
-  });
+  const filteredProducts = searchResults ?? products;
 
   return (
     <div>